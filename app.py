@@ -1,29 +1,100 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, inspect, select, insert, update, text, bindparam, func, case, and_, or_, Column, Index, Integer, String, Float, Date, DateTime, Boolean, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
-import pandas as pd
-import pdfkit
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship, joinedload, selectinload
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timedelta
+from invoice import Invoice, InvoiceDetail, InvoiceLine, WkhtmltopdfBackend, ReportLabBackend
+# pandas and pdfkit are imported inside the functions and pages that use them, so the login page
+# can render before they are loaded
 import io
-import sqlite3
 import bcrypt
 import re
 import os
+import sys
 import shutil
+import time
+import random
+import math
+import glob
+import hashlib
+import threading
+import tempfile
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Set page configuration as the first Streamlit command
 st.set_page_config(page_title="Inaya Cloth - Ladies Specialist", layout="wide")
 
 # Database Setup
+DATABASE_URL = os.environ.get("INAYA_DATABASE_URL", "sqlite:///inaya_cloth.db")
+DB_POOL_SIZE = int(os.environ.get("INAYA_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("INAYA_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.environ.get("INAYA_DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("INAYA_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.environ.get("INAYA_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("INAYA_SQLITE_CACHE_SIZE_KB", "65536"))
+COMMIT_RETRIES = int(os.environ.get("INAYA_COMMIT_RETRIES", "5"))
+COMMIT_RETRY_DELAY = 0.05  # seconds, doubled after every failed attempt
+INVOICE_CACHE_DIR = os.environ.get("INAYA_INVOICE_CACHE_DIR", "invoice_cache")
+INVOICE_CACHE_MAX_BYTES = int(os.environ.get("INAYA_INVOICE_CACHE_MAX_MB", "200")) * 1024 * 1024
+PDF_WORKERS = int(os.environ.get("INAYA_PDF_WORKERS", "2"))
+PDF_QUEUE_LIMIT = int(os.environ.get("INAYA_PDF_QUEUE_LIMIT", "20"))
+PDF_BACKEND = os.environ.get("INAYA_PDF_BACKEND", "auto")  # "wkhtmltopdf", "reportlab" or "auto"
+EXPORT_CHUNK_SIZE = int(os.environ.get("INAYA_EXPORT_CHUNK_SIZE", "200"))
+MERGED_EXPORT_LIMIT = int(os.environ.get("INAYA_MERGED_EXPORT_LIMIT", "1000"))  # invoices per merged PDF
+BCRYPT_ROUNDS = int(os.environ.get("INAYA_BCRYPT_ROUNDS", "12"))
+AUTH_WORKERS = int(os.environ.get("INAYA_AUTH_WORKERS", "2"))
+LOGIN_EMAIL_BURST = int(os.environ.get("INAYA_LOGIN_EMAIL_BURST", "5"))
+LOGIN_EMAIL_REFILL_SECONDS = float(os.environ.get("INAYA_LOGIN_EMAIL_REFILL_SECONDS", "30"))
+LOGIN_IP_BURST = int(os.environ.get("INAYA_LOGIN_IP_BURST", "20"))
+LOGIN_IP_REFILL_SECONDS = float(os.environ.get("INAYA_LOGIN_IP_REFILL_SECONDS", "3"))
+TRUSTED_PROXY = os.environ.get("INAYA_TRUSTED_PROXY", "").lower() in ("1", "true", "yes")  # behind a reverse proxy
+USER_CACHE_TTL = int(os.environ.get("INAYA_USER_CACHE_TTL", "60"))  # seconds
+
 Base = declarative_base()
-engine = create_engine("sqlite:///inaya_cloth.db", echo=False)
-Session = sessionmaker(bind=engine)
-session = Session()
+
+# Tune every new SQLite connection: WAL lets report reads run alongside sale commits
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL;")
+    cursor.execute("PRAGMA synchronous=NORMAL;")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};")
+    cursor.close()
+
+# One pooled engine per process, shared by every browser tab and script run
+@st.cache_resource
+def get_engine():
+    engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", configure_sqlite_connection)
+    return engine
+
+# Thread-local session registry; each script run gets its own session, removed when the run ends
+@st.cache_resource
+def get_session_registry():
+    return scoped_session(sessionmaker(bind=get_engine()))
+
+engine = get_engine()
+Session = get_session_registry()
+session = Session
 
 # Configure pdfkit to use wkhtmltopdf
 def configure_pdfkit():
+    import pdfkit
     wkhtmltopdf_path = shutil.which("wkhtmltopdf")  # Finds wkhtmltopdf in PATH
     error_message = None
     pdfkit_config = None
@@ -49,6 +120,232 @@ def configure_pdfkit():
 
     return pdfkit_config, error_message
 
+# Choose the invoice PDF backend. "auto" uses wkhtmltopdf when it is installed and falls back to
+# the in-process reportlab renderer otherwise. Returns the backend (or None) and a warning message.
+# Probed once per process rather than on every script run.
+@st.cache_resource
+def configure_invoice_backend():
+    if PDF_BACKEND not in ("auto", "wkhtmltopdf", "reportlab"):
+        return None, f"Unknown INAYA_PDF_BACKEND '{PDF_BACKEND}'. PDF generation will be disabled."
+    if PDF_BACKEND != "reportlab":
+        pdfkit_config, wkhtmltopdf_error = configure_pdfkit()
+        if pdfkit_config:
+            return WkhtmltopdfBackend(pdfkit_config), None
+        if PDF_BACKEND == "wkhtmltopdf":
+            return None, wkhtmltopdf_error
+    try:
+        return ReportLabBackend(), None
+    except ImportError:
+        return None, "No invoice PDF backend available: install wkhtmltopdf, or install reportlab and set INAYA_PDF_BACKEND=reportlab."
+
+# Rendered invoice PDFs are cached on disk as <type>_<id>_<invoice hash>.pdf. A changed document
+# hashes differently, so stale renders are never served; they are dropped explicitly when a return
+# or cancellation changes the sale, and otherwise age out. Least recently used files are evicted
+# once the directory exceeds INVOICE_CACHE_MAX_BYTES.
+def invoice_cache_path(document_type, document_id, invoice):
+    digest = hashlib.sha256(f"{invoice_backend.name}:{invoice!r}".encode("utf-8")).hexdigest()[:32]
+    return os.path.join(INVOICE_CACHE_DIR, f"{document_type}_{document_id}_{digest}.pdf")
+
+def invalidate_invoice_cache(document_type, document_id):
+    for path in glob.glob(os.path.join(INVOICE_CACHE_DIR, f"{document_type}_{document_id}_*.pdf")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+# Renderer threads evict concurrently, so any entry may vanish between the scan and its stat or removal
+def evict_invoice_cache():
+    entries = []
+    for entry in os.scandir(INVOICE_CACHE_DIR):
+        if entry.name.endswith(".pdf"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_bytes <= INVOICE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+
+def render_invoice_pdf(document_type, document_id, invoice):
+    path = invoice_cache_path(document_type, document_id, invoice)
+    try:
+        with open(path, "rb") as cached:
+            pdf_bytes = cached.read()
+        os.utime(path)  # mark as recently used for LRU eviction
+        return pdf_bytes
+    except FileNotFoundError:
+        pass
+    pdf_bytes = invoice_backend.render(invoice)
+    os.makedirs(INVOICE_CACHE_DIR, exist_ok=True)
+    # A temp file per writer, so two threads rendering the same document never share one
+    fd, temp_path = tempfile.mkstemp(dir=INVOICE_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as target:
+            target.write(pdf_bytes)
+        os.replace(temp_path, path)  # atomic, so concurrent readers never see a partial file
+    except OSError:
+        # Not cached this time; the render itself succeeded
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        return pdf_bytes
+    evict_invoice_cache()
+    return pdf_bytes
+
+class RendererBusyError(RuntimeError):
+    pass
+
+# Process-wide invoice renderer: a bounded thread pool (wkhtmltopdf jobs wait on a subprocess)
+# that hands back futures, so the script thread never blocks on a render. Once `queue_limit` jobs
+# are queued or running, new jobs are refused instead of piling up behind the billing counter.
+class InvoiceRenderer:
+    def __init__(self, render, workers, queue_limit):
+        self.render = render
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="invoice-pdf")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.latencies = deque(maxlen=100)
+
+    def submit(self, document_type, document_id, invoice):
+        with self.lock:
+            if self.pending >= self.queue_limit:
+                raise RendererBusyError(f"Invoice renderer is busy ({self.pending} invoices queued). Please try again in a moment.")
+            self.pending += 1
+        return self.executor.submit(self._run, document_type, document_id, invoice)
+
+    def _run(self, document_type, document_id, invoice):
+        started = time.perf_counter()
+        try:
+            return self.render(document_type, document_id, invoice)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.latencies.append(time.perf_counter() - started)
+
+    def stats(self):
+        with self.lock:
+            average = sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+            return {"queue_depth": self.pending, "average_latency": average, "rendered": len(self.latencies)}
+
+@st.cache_resource
+def get_invoice_renderer():
+    return InvoiceRenderer(render_invoice_pdf, PDF_WORKERS, PDF_QUEUE_LIMIT)
+
+def queue_invoice(document_type, document_id, invoice):
+    future = get_invoice_renderer().submit(document_type, document_id, invoice)
+    st.session_state.invoice_jobs[f"{document_type}_{document_id}"] = future
+
+# Poll a queued invoice from a fragment and offer the download once the PDF is ready
+def show_invoice_job(document_type, document_id, label):
+    job_key = f"{document_type}_{document_id}"
+    future = st.session_state.invoice_jobs.get(job_key)
+    if future is None:
+        return
+    polling = not future.done()
+
+    @st.fragment(run_every=1 if polling else None)
+    def invoice_job_status():
+        if not future.done():
+            stats = get_invoice_renderer().stats()
+            st.info(f"Rendering {document_type} invoice... {stats['queue_depth']} in queue, "
+                    f"average render {stats['average_latency']:.2f}s.")
+        elif polling:
+            st.rerun()  # full rerun so the finished job is redrawn without polling
+        elif future.exception():
+            st.error(f"Error generating PDF: {str(future.exception())}")
+            del st.session_state.invoice_jobs[job_key]
+        else:
+            st.download_button(
+                label=label,
+                data=io.BytesIO(future.result()),
+                file_name=f"{job_key}.pdf",
+                mime="application/pdf",
+                key=f"download_{job_key}",
+            )
+
+    invoice_job_status()
+
+# Password hashing runs on a small process-wide pool, so a burst of logins (or a brute-force
+# attempt) keeps at most AUTH_WORKERS cores busy with bcrypt
+@st.cache_resource
+def get_password_pool():
+    return ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+
+def hash_password(password):
+    future = get_password_pool().submit(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS))
+    return future.result().decode("utf-8")
+
+def verify_password(password, hashed_password):
+    return get_password_pool().submit(bcrypt.checkpw, password.encode("utf-8"), hashed_password.encode("utf-8")).result()
+
+# In-memory token bucket per key: `capacity` attempts in a burst, one more every `refill_seconds`.
+# take() returns 0 when an attempt is allowed, otherwise the seconds until the next one is.
+# At most MAX_KEYS buckets are kept; the least recently used one is dropped to make room.
+class TokenBucketLimiter:
+    MAX_KEYS = 10000
+
+    def __init__(self, capacity, refill_seconds):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def _tokens(self, key, now):
+        tokens, updated = self.buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) / self.refill_seconds)
+
+    def take(self, key):
+        now = time.monotonic()
+        with self.lock:
+            tokens = self._tokens(key, now)
+            wait = (1 - tokens) * self.refill_seconds if tokens < 1 else 0
+            self.buckets[key] = (tokens if wait else tokens - 1, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.MAX_KEYS:
+                self.buckets.popitem(last=False)
+            return wait
+
+@st.cache_resource
+def get_login_limiters():
+    return {
+        "email": TokenBucketLimiter(LOGIN_EMAIL_BURST, LOGIN_EMAIL_REFILL_SECONDS),
+        "ip": TokenBucketLimiter(LOGIN_IP_BURST, LOGIN_IP_REFILL_SECONDS),
+    }
+
+# Client address as reported by a trusted reverse proxy (INAYA_TRUSTED_PROXY), else None. Without a
+# proxy the forwarding headers come from the client itself and could name any address. The proxy
+# appends the peer it saw, so the last X-Forwarded-For entry is the one it vouches for.
+def client_ip():
+    if not TRUSTED_PROXY:
+        return None
+    try:
+        headers = st.context.headers
+    except Exception:
+        return None
+    forwarded = headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[-1].strip() or None
+    return (headers.get("X-Real-Ip") or "").strip() or None
+
+# Seconds the caller must wait before another login attempt for this email/address, or 0
+def login_throttle(email):
+    limiters = get_login_limiters()
+    wait = limiters["email"].take(email.strip().lower())
+    ip = client_ip()
+    if ip:
+        wait = max(wait, limiters["ip"].take(ip))
+    return wait
+
 # Database Models
 class Stock(Base):
     __tablename__ = "stock"
@@ -57,13 +354,19 @@ class Stock(Base):
     quantity = Column(Integer, nullable=False)
     selling_price = Column(Float, nullable=False)
     mrp = Column(Float, nullable=False)
+    sku = Column(String(50), unique=True, index=True)
+    reorder_level = Column(Integer, nullable=False, default=0)
+
+# Partial index over items that have a reorder level, keyed on how far above it they are, so the
+# low-stock lookup is a range search over tracked items only
+Index("ix_stock_reorder_gap", Stock.quantity - Stock.reorder_level, sqlite_where=Stock.reorder_level > 0)
 
 class GRN(Base):
     __tablename__ = "grn"
     id = Column(Integer, primary_key=True)
-    stock_id = Column(Integer, ForeignKey("stock.id"), nullable=False)
+    stock_id = Column(Integer, ForeignKey("stock.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, default=datetime.utcnow, index=True)
 
 class User(Base):
     __tablename__ = "user"
@@ -74,20 +377,36 @@ class User(Base):
     role = Column(String(50), nullable=False)
     is_active = Column(Boolean, default=True)
 
+class Customer(Base):
+    __tablename__ = "customer"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    mobile = Column(String(15), unique=True, nullable=False, index=True)
+    address = Column(String(255))
+
+Index("ix_customer_name_nocase", Customer.name.collate("NOCASE"))
+
+# Sales and deliveries link to the customer record; the name, mobile and address columns keep the
+# details as printed on that invoice
 class Sale(Base):
     __tablename__ = "sale"
     id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customer.id"), index=True)
     customer_name = Column(String(100))
-    customer_mobile = Column(String(15))
+    customer_mobile = Column(String(15), index=True)
     customer_address = Column(String(255))
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, default=datetime.utcnow, index=True)
     items = relationship("SaleItem", back_populates="sale")
+    customer = relationship("Customer")
+
+# Case-insensitive customer name prefix search for the sale finder
+Index("ix_sale_customer_name_nocase", Sale.customer_name.collate("NOCASE"))
 
 class SaleItem(Base):
     __tablename__ = "sale_item"
     id = Column(Integer, primary_key=True)
-    sale_id = Column(Integer, ForeignKey("sale.id"), nullable=False)
-    stock_id = Column(Integer, ForeignKey("stock.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sale.id"), nullable=False, index=True)
+    stock_id = Column(Integer, ForeignKey("stock.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     total_price = Column(Float, nullable=False)
     sale = relationship("Sale", back_populates="items")
@@ -96,37 +415,287 @@ class SaleItem(Base):
 class Return(Base):
     __tablename__ = "return"
     id = Column(Integer, primary_key=True)
-    sale_item_id = Column(Integer, ForeignKey("sale_item.id"), nullable=False)
+    sale_item_id = Column(Integer, ForeignKey("sale_item.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     reason = Column(String(255))
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, default=datetime.utcnow, index=True)
     sale_item = relationship("SaleItem")
 
 class Delivery(Base):
     __tablename__ = "delivery"
     id = Column(Integer, primary_key=True)
-    sale_id = Column(Integer, ForeignKey("sale.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sale.id"), nullable=False, index=True)
+    customer_id = Column(Integer, ForeignKey("customer.id"), index=True)
     status = Column(String(50), nullable=False)
     customer_name = Column(String(100))
     customer_mobile = Column(String(15))
     customer_address = Column(String(255))
     reason = Column(String(255))
-    date = Column(DateTime, default=datetime.utcnow)
+    date = Column(DateTime, default=datetime.utcnow, index=True)
     items = relationship("DeliveryItem", back_populates="delivery")
 
 class DeliveryItem(Base):
     __tablename__ = "delivery_item"
     id = Column(Integer, primary_key=True)
-    delivery_id = Column(Integer, ForeignKey("delivery.id"), nullable=False)
-    sale_item_id = Column(Integer, ForeignKey("sale_item.id"), nullable=False)
+    delivery_id = Column(Integer, ForeignKey("delivery.id"), nullable=False, index=True)
+    sale_item_id = Column(Integer, ForeignKey("sale_item.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     delivery = relationship("Delivery", back_populates="items")
     sale_item = relationship("SaleItem")
 
+# Append-only stock ledger. Every stock write adds one row per item it touched, in the same
+# transaction, holding the signed change and the item's quantity after it. That running balance
+# makes each row a snapshot: the stock of an item at any moment is its last row at or before it.
+class StockMovement(Base):
+    __tablename__ = "stock_movement"
+    id = Column(Integer, primary_key=True)
+    stock_id = Column(Integer, ForeignKey("stock.id"), nullable=False)
+    date = Column(DateTime, default=datetime.utcnow, nullable=False)
+    kind = Column(String(20), nullable=False)
+    reference_id = Column(Integer)
+    change = Column(Integer, nullable=False)
+    balance = Column(Integer, nullable=False)
+
+Index("ix_stock_movement_stock_date", StockMovement.stock_id, StockMovement.date)
+
+# Pre-aggregated sales per sale day, and per sale day and item. Rows are keyed by the day the sale
+# was made: a later return or delivery cancellation adjusts the row of the original sale day.
+# items_sold and revenue hold what customers kept (net of returns, excluding cancelled deliveries).
+class DailySalesSummary(Base):
+    __tablename__ = "daily_sales_summary"
+    day = Column(Date, primary_key=True)
+    sales_count = Column(Integer, nullable=False, default=0)
+    items_sold = Column(Integer, nullable=False, default=0)
+    items_returned = Column(Integer, nullable=False, default=0)
+    items_cancelled = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+class DailyItemSales(Base):
+    __tablename__ = "daily_item_sales"
+    day = Column(Date, primary_key=True)
+    stock_id = Column(Integer, ForeignKey("stock.id"), primary_key=True, index=True)
+    items_sold = Column(Integer, nullable=False, default=0)
+    items_returned = Column(Integer, nullable=False, default=0)
+    items_cancelled = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+# One row per applied schema version; see apply_migrations()
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+# Index-friendly prefix test: a range on the column instead of LIKE 'prefix%'
+def prefix_match(column, prefix):
+    return and_(column >= prefix, column < prefix + "\U0010ffff")
+
+# Items with a reorder level above zero whose quantity is at or below it. The conditions repeat the
+# ix_stock_reorder_gap expression and WHERE clause so SQLite can range-search that partial index.
+def low_stock_query():
+    return (select(Stock.id, Stock.name, Stock.quantity, Stock.reorder_level)
+            .where(Stock.reorder_level > 0, Stock.quantity - Stock.reorder_level <= 0))
+
+# Indexes declared on the models but absent from the database. Names come from sqlite_master
+# because SQLAlchemy does not reflect expression indexes such as ix_stock_reorder_gap.
+def find_missing_indexes():
+    with engine.connect() as conn:
+        existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [index.name for table in Base.metadata.sorted_tables for index in table.indexes if index.name not in existing]
+
+# Lookups that run on every report/invoice render and must be served by an index search
+def hot_lookup_queries():
+    return {
+        "sale items by sale": select(SaleItem.id).where(SaleItem.sale_id == 1),
+        "sale items by stock": select(SaleItem.id).where(SaleItem.stock_id == 1),
+        "returns by sale item": select(Return.id).where(Return.sale_item_id == 1),
+        "deliveries by sale": select(Delivery.id).where(Delivery.sale_id == 1),
+        "delivery items by delivery": select(DeliveryItem.id).where(DeliveryItem.delivery_id == 1),
+        "delivery items by sale item": select(DeliveryItem.id).where(DeliveryItem.sale_item_id == 1),
+        "GRNs by stock": select(GRN.id).where(GRN.stock_id == 1),
+        "sales by date": select(Sale.id).where(Sale.date >= datetime(2000, 1, 1)),
+        "GRNs by date": select(GRN.id).where(GRN.date >= datetime(2000, 1, 1)),
+        "returns by date": select(Return.id).where(Return.date >= datetime(2000, 1, 1)),
+        "deliveries by date": select(Delivery.id).where(Delivery.date >= datetime(2000, 1, 1)),
+        "sales by customer mobile": select(Sale.id).where(prefix_match(Sale.customer_mobile, "99")),
+        "sales by customer": select(Sale.id).where(Sale.customer_id == 1),
+        "customers by mobile": select(Customer.id).where(prefix_match(Customer.mobile, "99")),
+        "customers by name": select(Customer.id).where(prefix_match(Customer.name.collate("NOCASE"), "ab")),
+        "sales by customer name": select(Sale.id).where(prefix_match(Sale.customer_name.collate("NOCASE"), "ab")),
+        "stock movements by item and date": stock_as_of_query(1, datetime(2000, 1, 1)),
+        "items at or below reorder level": low_stock_query(),
+    }
+
+# SQLite EXPLAIN QUERY PLAN details for each hot lookup
+def explain_hot_lookups():
+    plans = {}
+    with engine.connect() as conn:
+        for label, query in hot_lookup_queries().items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plans[label] = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return plans
+
+# Names of hot lookups whose SQLite query plan falls back to a full table scan
+def find_table_scans():
+    if engine.dialect.name != "sqlite":
+        return []
+    return [label for label, plan in explain_hot_lookups().items() if any(detail.startswith("SCAN") for detail in plan)]
+
+# Sales summary maintenance. Transactions call add_to_sales_summary() with per-line deltas, which
+# are folded per key and added to the stored rows with one INSERT ... ON CONFLICT DO UPDATE each.
+ITEM_SUMMARY_COUNTERS = ("items_sold", "items_returned", "items_cancelled", "revenue")
+DAY_SUMMARY_COUNTERS = ("sales_count",) + ITEM_SUMMARY_COUNTERS
+
+def upsert_summary_deltas(model, key_columns, counters, rows):
+    if not rows:
+        return
+    table = model.__table__
+    statement = sqlite_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={counter: table.c[counter] + statement.excluded[counter] for counter in counters},
+    )
+    session.execute(statement, rows)
+
+# `deltas` holds dicts with day, stock_id and any item counters; `sale_days` has one day per new sale
+def add_to_sales_summary(deltas, sale_days=()):
+    days = {}
+    items = {}
+    for day in sale_days:
+        days.setdefault(day, dict.fromkeys(DAY_SUMMARY_COUNTERS, 0))["sales_count"] += 1
+    for delta in deltas:
+        day_row = days.setdefault(delta["day"], dict.fromkeys(DAY_SUMMARY_COUNTERS, 0))
+        item_row = items.setdefault((delta["day"], delta["stock_id"]), dict.fromkeys(ITEM_SUMMARY_COUNTERS, 0))
+        for counter in ITEM_SUMMARY_COUNTERS:
+            day_row[counter] += delta.get(counter, 0)
+            item_row[counter] += delta.get(counter, 0)
+    upsert_summary_deltas(DailySalesSummary, ["day"], DAY_SUMMARY_COUNTERS,
+                          [{"day": day, **counters} for day, counters in days.items()])
+    upsert_summary_deltas(DailyItemSales, ["day", "stock_id"], ITEM_SUMMARY_COUNTERS,
+                          [{"day": day, "stock_id": stock_id, **counters} for (day, stock_id), counters in items.items()])
+
+def cancelled_sale_ids(sale_ids):
+    return set(session.scalars(
+        select(Delivery.sale_id).where(Delivery.sale_id.in_(set(sale_ids)), Delivery.status == "Cancelled")
+    ))
+
+# Recompute both summaries from the raw sale, return and delivery rows with grouped SQL
+def expected_sales_summary(db_session):
+    import pandas as pd
+    sale_day = func.date(Sale.date).label("day")
+    cancelled = select(Delivery.sale_id).where(Delivery.status == "Cancelled")
+    connection = db_session.connection()
+    key = ["day", "stock_id"]
+    frames = [
+        pd.read_sql(select(sale_day, SaleItem.stock_id, func.sum(SaleItem.quantity).label("items_sold"),
+                           func.sum(SaleItem.total_price).label("revenue"))
+                    .join(Sale, SaleItem.sale_id == Sale.id)
+                    .where(Sale.id.not_in(cancelled))
+                    .group_by(sale_day, SaleItem.stock_id), connection),
+        pd.read_sql(select(sale_day, SaleItem.stock_id, func.sum(Return.quantity).label("items_returned"))
+                    .join(SaleItem, Return.sale_item_id == SaleItem.id)
+                    .join(Sale, SaleItem.sale_id == Sale.id)
+                    .group_by(sale_day, SaleItem.stock_id), connection),
+        pd.read_sql(select(sale_day, SaleItem.stock_id, func.sum(DeliveryItem.quantity).label("items_cancelled"))
+                    .join(Delivery, DeliveryItem.delivery_id == Delivery.id)
+                    .join(SaleItem, DeliveryItem.sale_item_id == SaleItem.id)
+                    .join(Sale, SaleItem.sale_id == Sale.id)
+                    .where(Delivery.status == "Cancelled")
+                    .group_by(sale_day, SaleItem.stock_id), connection),
+    ]
+    items = frames[0]
+    for frame in frames[1:]:
+        items = items.merge(frame, on=key, how="outer")
+    counts = {"stock_id": int, "items_sold": int, "items_returned": int, "items_cancelled": int}
+    items = items.reindex(columns=key + list(ITEM_SUMMARY_COUNTERS)).fillna(0).astype(counts)
+    sales = pd.read_sql(select(sale_day, func.count(Sale.id).label("sales_count")).group_by(sale_day), connection)
+    days = (sales.merge(items.groupby("day", as_index=False)[list(ITEM_SUMMARY_COUNTERS)].sum(), on="day", how="outer")
+            .fillna(0).astype({"sales_count": int, **{name: kind for name, kind in counts.items() if name != "stock_id"}}))
+    return days, items
+
+def stored_sales_summary(db_session):
+    import pandas as pd
+    connection = db_session.connection()
+    days = pd.read_sql(select(*DailySalesSummary.__table__.c), connection)
+    items = pd.read_sql(select(*DailyItemSales.__table__.c), connection)
+    return days, items
+
+def count_summary_mismatches(expected, stored, key, counters):
+    import pandas as pd
+    expected = expected.assign(day=expected["day"].astype(str))
+    stored = stored.assign(day=stored["day"].astype(str))
+    merged = expected.merge(stored, on=key, how="outer", suffixes=("_expected", "_stored")).fillna(0)
+    differs = pd.Series(False, index=merged.index)
+    for counter in counters:
+        differs |= (merged[f"{counter}_expected"].astype(float) - merged[f"{counter}_stored"].astype(float)).abs() > 0.005
+    return int(differs.sum())
+
+# Rebuild both summaries from raw rows inside the caller's transaction. Returns how many stored
+# day and item rows disagreed with the recomputed values (0 and 0 when the summaries were in sync).
+def rebuild_sales_summary(db_session):
+    import pandas as pd
+    expected_days, expected_items = expected_sales_summary(db_session)
+    stored_days, stored_items = stored_sales_summary(db_session)
+    mismatches = {
+        "days": count_summary_mismatches(expected_days, stored_days, ["day"], DAY_SUMMARY_COUNTERS),
+        "items": count_summary_mismatches(expected_items, stored_items, ["day", "stock_id"], ITEM_SUMMARY_COUNTERS),
+    }
+    db_session.query(DailyItemSales).delete()
+    db_session.query(DailySalesSummary).delete()
+    for model, frame in ((DailySalesSummary, expected_days), (DailyItemSales, expected_items)):
+        if not frame.empty:
+            frame = frame.assign(day=pd.to_datetime(frame["day"]).dt.date)
+            db_session.execute(insert(model.__table__), frame.to_dict("records"))
+    return mismatches
+
+# Stock ledger maintenance. Transactions change Stock.quantity first, then call
+# record_stock_movements() with one {"stock_id", "change", "reference_id"} entry per line; the
+# balances are read back from the updated rows, so they match what the transaction commits.
+def record_stock_movements(kind, movements):
+    movements = list(movements)
+    if not movements:
+        return
+    session.flush()
+    balances = dict(session.execute(
+        select(Stock.id, Stock.quantity).where(Stock.id.in_({movement["stock_id"] for movement in movements}))
+    ).all())
+    moved_at = datetime.utcnow()
+    rows = []
+    # Walk back from the final quantities so several lines for one item each get their own balance
+    for movement in reversed(movements):
+        stock_id = movement["stock_id"]
+        rows.append({"stock_id": stock_id, "date": moved_at, "kind": kind, "reference_id": movement.get("reference_id"),
+                     "change": movement["change"], "balance": balances[stock_id]})
+        balances[stock_id] -= movement["change"]
+    session.execute(insert(StockMovement.__table__), rows[::-1])
+
+# Open the ledger of every item that has no movements yet at its current quantity; returns the row count
+def open_stock_ledger(db_session, kind):
+    movement_table = StockMovement.__table__
+    stock_table = Stock.__table__
+    has_movements = select(movement_table.c.id).where(movement_table.c.stock_id == stock_table.c.id).exists()
+    result = db_session.execute(insert(movement_table).from_select(
+        ["stock_id", "date", "kind", "change", "balance"],
+        select(stock_table.c.id, bindparam("date", datetime.utcnow(), type_=DateTime), bindparam("kind", kind),
+               stock_table.c.quantity, stock_table.c.quantity)
+        .where(~has_movements),
+    ))
+    return result.rowcount
+
+# Latest ledger row of an item at or before a moment: a single backward seek on ix_stock_movement_stock_date
+def stock_as_of_query(stock_id, moment):
+    return (select(StockMovement.balance)
+            .where(StockMovement.stock_id == stock_id, StockMovement.date <= moment)
+            .order_by(StockMovement.date.desc(), StockMovement.id.desc())
+            .limit(1))
+
+# Quantity held at a moment, or None if the item has no ledger rows by then
+def stock_as_of(stock_id, moment):
+    return session.scalar(stock_as_of_query(stock_id, moment))
+
 # Database Migration
 def migrate_database():
     Base.metadata.create_all(engine)  # Create all tables before migrations
-    conn = sqlite3.connect("inaya_cloth.db")
+    conn = engine.raw_connection()
     cursor = conn.cursor()
     migration_messages = []
     
@@ -142,6 +711,12 @@ def migrate_database():
             cursor.execute("ALTER TABLE stock ADD COLUMN mrp FLOAT NOT NULL DEFAULT 0.0;")
             cursor.execute("UPDATE stock SET mrp = selling_price WHERE mrp = 0.0;")
             migration_messages.append("Added 'mrp' column to stock table.")
+        if "sku" not in columns:
+            cursor.execute("ALTER TABLE stock ADD COLUMN sku VARCHAR(50);")
+            migration_messages.append("Added 'sku' column to stock table.")
+        if "reorder_level" not in columns:
+            cursor.execute("ALTER TABLE stock ADD COLUMN reorder_level INTEGER NOT NULL DEFAULT 0;")
+            migration_messages.append("Added 'reorder_level' column to stock table.")
     
     # Check and migrate sale table
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sale';")
@@ -220,6 +795,66 @@ def migrate_database():
         );
     """)
     
+    # Full-text index over stock names and SKUs for the item pickers. It is an external content table
+    # (the text stays in stock); the triggers keep it in step with every insert, rename and delete, and
+    # quantity updates never touch it.
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_search';")
+    if not cursor.fetchone():
+        cursor.execute("""
+            CREATE VIRTUAL TABLE stock_search USING fts5(
+                name, sku, content='stock', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            );
+        """)
+        cursor.execute("INSERT INTO stock_search (stock_search) VALUES ('rebuild');")
+        migration_messages.append("Built full-text search index over stock names.")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stock_search_insert AFTER INSERT ON stock BEGIN
+            INSERT INTO stock_search (rowid, name, sku) VALUES (new.id, new.name, new.sku);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stock_search_delete AFTER DELETE ON stock BEGIN
+            INSERT INTO stock_search (stock_search, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stock_search_update AFTER UPDATE OF name, sku ON stock BEGIN
+            INSERT INTO stock_search (stock_search, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+            INSERT INTO stock_search (rowid, name, sku) VALUES (new.id, new.name, new.sku);
+        END;
+    """)
+    
+    # Link sales and deliveries to customer records: one customer per distinct mobile, taking the
+    # name and address from that mobile's latest sale
+    cursor.execute("PRAGMA table_info(sale);")
+    if "customer_id" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE sale ADD COLUMN customer_id INTEGER REFERENCES customer(id);")
+        cursor.execute("""
+            INSERT INTO customer (name, mobile, address)
+            SELECT COALESCE(NULLIF(TRIM(customer_name), ''), 'Unknown'), TRIM(customer_mobile), customer_address
+            FROM sale
+            WHERE id IN (
+                SELECT MAX(id)
+                FROM sale
+                WHERE TRIM(customer_mobile) != ''
+                GROUP BY TRIM(customer_mobile)
+            )
+            ON CONFLICT(mobile) DO NOTHING;
+        """)
+        customers_created = cursor.rowcount
+        cursor.execute("""
+            UPDATE sale
+            SET customer_id = (SELECT id FROM customer WHERE customer.mobile = TRIM(sale.customer_mobile))
+            WHERE TRIM(customer_mobile) != '';
+        """)
+        migration_messages.append(f"Linked {cursor.rowcount} sales to {customers_created} new customer records.")
+    cursor.execute("PRAGMA table_info(delivery);")
+    if "customer_id" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE delivery ADD COLUMN customer_id INTEGER REFERENCES customer(id);")
+        cursor.execute("UPDATE delivery SET customer_id = (SELECT customer_id FROM sale WHERE sale.id = delivery.sale_id);")
+        migration_messages.append("Linked deliveries to customer records.")
+    
     # Check and clean duplicate users
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user';")
     if cursor.fetchone():
@@ -236,12 +871,46 @@ def migrate_database():
     conn.commit()
     conn.close()
 
+    # Create indexes missing from tables that predate them (create_all skips existing tables)
+    missing_indexes = set(find_missing_indexes())
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in missing_indexes:
+                index.create(bind=engine, checkfirst=True)
+                migration_messages.append(f"Created index '{index.name}' on {table.name} table.")
+
+    # Build the sales summaries from existing sales the first time they are empty
+    summary_session = Session.session_factory()
+    try:
+        if summary_session.query(DailySalesSummary).first() is None and summary_session.query(Sale.id).first() is not None:
+            rebuild_sales_summary(summary_session)
+            summary_session.commit()
+            migration_messages.append("Built daily sales summaries from existing sales.")
+    except Exception as e:
+        summary_session.rollback()
+        migration_messages.append(f"Error building sales summaries: {str(e)}")
+    finally:
+        summary_session.close()
+
+    # Open the stock ledger at current quantities for items stocked before it existed
+    ledger_session = Session.session_factory()
+    try:
+        opened = open_stock_ledger(ledger_session, "opening")
+        ledger_session.commit()
+        if opened:
+            migration_messages.append(f"Opened the stock ledger for {opened} items at their current quantity.")
+    except Exception as e:
+        ledger_session.rollback()
+        migration_messages.append(f"Error opening the stock ledger: {str(e)}")
+    finally:
+        ledger_session.close()
+
     # Create default admin user
-    session = Session()
+    session = Session.session_factory()
     try:
         existing_user = session.query(User).filter_by(email="alam@gmail.com").first()
         if not existing_user:
-            hashed_password = bcrypt.hashpw("admin123".encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+            hashed_password = hash_password("admin123")
             admin_user = User(
                 name="Admin User",
                 email="alam@gmail.com",
@@ -260,11 +929,834 @@ def migrate_database():
     
     return migration_messages
 
+# Bump whenever migrate_database() gains a step, so existing databases run it once more
+SCHEMA_VERSION = 4
+
+# Run migrate_database() only if the database is behind SCHEMA_VERSION, then record the new version
+def apply_migrations():
+    with engine.connect() as conn:
+        current = conn.scalar(select(func.max(SchemaVersion.version))) if inspect(conn).has_table("schema_version") else None
+    if (current or 0) >= SCHEMA_VERSION:
+        return []
+    migration_messages = migrate_database()
+    with engine.begin() as conn:
+        conn.execute(sqlite_insert(SchemaVersion.__table__)
+                     .values(version=SCHEMA_VERSION, applied_at=datetime.utcnow())
+                     .on_conflict_do_nothing())
+    migration_messages.append(f"Database schema is at version {SCHEMA_VERSION}.")
+    return migration_messages
+
+# Startup check: report anything the hot lookups cannot use. Runs on every start, not only when
+# migrations are pending, so a dropped index or a plan regression is noticed.
+def check_lookup_indexes():
+    warnings = [f"Warning: index '{index_name}' is missing." for index_name in find_missing_indexes()]
+    warnings.extend(f"Warning: lookup of {label} uses a full table scan." for label in find_table_scans())
+    return warnings
+
+# Checked once per process instead of on every script run
+@st.cache_resource
+def run_migrations():
+    return apply_migrations() + check_lookup_indexes()
+
+# `python app.py migrate` applies pending migrations from the command line without starting the UI
+if not st.runtime.exists() and sys.argv[1:] == ["migrate"]:
+    for message in (apply_migrations() or ["Database schema is up to date."]) + check_lookup_indexes():
+        print(message)
+    sys.exit(0)
+
 # Perform migration
-migration_messages = migrate_database()
+migration_messages = run_migrations()
+
+# Configure the invoice PDF backend after database setup
+invoice_backend, invoice_backend_error = configure_invoice_backend()
+
+# Run a unit of work and commit it, retrying from scratch while SQLite reports the database as locked.
+# `work` raises ValueError for validation failures; any failure rolls the session back before re-raising.
+def commit_with_retry(work, *args, retries=COMMIT_RETRIES, **kwargs):
+    for attempt in range(1, retries + 1):
+        try:
+            result = work(*args, **kwargs)
+            session.commit()
+            return result
+        except OperationalError as e:
+            session.rollback()
+            if "database is locked" not in str(e) or attempt == retries:
+                raise
+            time.sleep(COMMIT_RETRY_DELAY * 2 ** (attempt - 1) * (1 + random.random()))
+        except Exception:
+            session.rollback()
+            raise
+
+# Batch loaders: resolve every referenced row of a cart in one IN (...) query
+def load_stocks(stock_ids):
+    stock_ids = set(stock_ids)
+    if not stock_ids:
+        return {}
+    return {stock.id: stock for stock in session.query(Stock).filter(Stock.id.in_(stock_ids))}
+
+def load_sale_items(sale_item_ids):
+    sale_item_ids = set(sale_item_ids)
+    if not sale_item_ids:
+        return {}
+    query = (session.query(SaleItem)
+             .options(joinedload(SaleItem.stock), joinedload(SaleItem.sale))
+             .filter(SaleItem.id.in_(sale_item_ids)))
+    return {sale_item.id: sale_item for sale_item in query}
+
+# Raised when a guarded stock decrement could not be applied; carries one message per short line
+class InsufficientStockError(ValueError):
+    def __init__(self, messages):
+        self.messages = messages
+        super().__init__("\n\n".join(messages))
+
+# Take stock for a cart with one guarded UPDATE per stock row, sent as a single executemany.
+# A row is only decremented if it still holds enough quantity at UPDATE time, so two counters
+# selling the last piece cannot both succeed.
+def decrement_stock(cart_items, stocks):
+    requested = {}
+    for item in cart_items:
+        requested[item["stock_id"]] = requested.get(item["stock_id"], 0) + item["quantity"]
+    stock_table = Stock.__table__
+    result = session.execute(
+        update(stock_table)
+        .where(stock_table.c.id == bindparam("stock_id"), stock_table.c.quantity >= bindparam("requested"))
+        .values(quantity=stock_table.c.quantity - bindparam("requested")),
+        [{"stock_id": stock_id, "requested": quantity} for stock_id, quantity in requested.items()],
+    )
+    if result.rowcount != len(requested):
+        # Undo the partial decrement, then report every line the committed stock cannot cover
+        session.rollback()
+        available = dict(session.execute(
+            select(stock_table.c.id, stock_table.c.quantity).where(stock_table.c.id.in_(requested.keys()))
+        ).all())
+        messages = [
+            f"Insufficient stock for {stocks[stock_id].name}: only {available.get(stock_id, 0)} available."
+            for stock_id, quantity in requested.items()
+            if available.get(stock_id, 0) < quantity
+        ]
+        raise InsufficientStockError(messages or ["Stock changed during checkout. Please try again."])
+
+# Transactions
+def submit_grn(grn_items):
+    stocks = load_stocks(item["stock_id"] for item in grn_items)
+    grns = []
+    for item in grn_items:
+        stock = stocks.get(item["stock_id"])
+        if not stock:
+            raise ValueError(f"Stock item ID {item['stock_id']} not found.")
+        grn = GRN(stock_id=stock.id, quantity=item["quantity"])
+        stock.quantity += item["quantity"]
+        session.add(grn)
+        grns.append(grn)
+    session.flush()
+    record_stock_movements("grn", [{"stock_id": grn.stock_id, "change": grn.quantity, "reference_id": grn.id} for grn in grns])
+
+def create_stock(name, sku, quantity, selling_price, mrp, reorder_level=0):
+    stock = Stock(name=name, quantity=quantity, selling_price=selling_price, mrp=mrp, sku=sku, reorder_level=reorder_level)
+    session.add(stock)
+    session.flush()
+    record_stock_movements("create", [{"stock_id": stock.id, "change": quantity}])
+    return stock.id
+
+# Set an item's quantity after a stock count; the ledger keeps the difference it made
+def adjust_stock(stock_id, new_quantity):
+    stock = session.get(Stock, stock_id)
+    if not stock:
+        raise ValueError(f"Stock item ID {stock_id} not found.")
+    change = new_quantity - stock.quantity
+    stock.quantity = new_quantity
+    record_stock_movements("adjust", [{"stock_id": stock.id, "change": change}])
+
+def set_reorder_level(stock_id, reorder_level):
+    stock = session.get(Stock, stock_id)
+    if not stock:
+        raise ValueError(f"Stock item ID {stock_id} not found.")
+    stock.reorder_level = reorder_level
+
+# Create or update the customer keyed by mobile with the details entered at checkout; returns its id
+def save_customer(name, mobile, address):
+    customer_table = Customer.__table__
+    statement = sqlite_insert(customer_table).values(name=name, mobile=mobile, address=address)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=["mobile"],
+        set_={"name": statement.excluded.name, "address": statement.excluded.address},
+    ))
+    return session.scalar(select(customer_table.c.id).where(customer_table.c.mobile == mobile))
+
+def complete_sale(sale_items, customer_name, customer_mobile, customer_address):
+    stocks = load_stocks(item["stock_id"] for item in sale_items)
+    decrement_stock(sale_items, stocks)
+    customer_mobile = customer_mobile.strip()
+    customer_id = save_customer(customer_name, customer_mobile, customer_address)
+    sale = Sale(customer_id=customer_id, customer_name=customer_name, customer_mobile=customer_mobile,
+                customer_address=customer_address)
+    for item in sale_items:
+        sale.items.append(SaleItem(
+            stock_id=item["stock_id"],
+            quantity=item["quantity"],
+            total_price=item["quantity"] * stocks[item["stock_id"]].selling_price
+        ))
+    session.add(sale)
+    session.flush()
+    add_to_sales_summary(
+        [{"day": sale.date.date(), "stock_id": item.stock_id, "items_sold": item.quantity, "revenue": item.total_price}
+         for item in sale.items],
+        sale_days=[sale.date.date()],
+    )
+    record_stock_movements("sale", [{"stock_id": item.stock_id, "change": -item.quantity, "reference_id": sale.id}
+                                    for item in sale.items])
+    return sale.id
+
+def complete_return(return_items):
+    sale_items = load_sale_items(item["sale_item_id"] for item in return_items)
+    cancelled = cancelled_sale_ids(sale_item.sale_id for sale_item in sale_items.values())
+    summary_deltas = []
+    movements = []
+    for item in return_items:
+        sale_item = sale_items[item["sale_item_id"]]
+        if item["quantity"] > sale_item.quantity:
+            raise ValueError(f"Cannot return {item['quantity']} units of item ID {sale_item.id}. Only {sale_item.quantity} available.")
+        if sale_item.quantity - item["quantity"] < 0:
+            raise ValueError(f"Return would result in negative quantity for item ID {sale_item.id}.")
+        return_entry = Return(
+            sale_item_id=item["sale_item_id"],
+            quantity=item["quantity"],
+            reason=item["reason"]
+        )
+        stock = sale_item.stock
+        previous_total = sale_item.total_price
+        stock.quantity += item["quantity"]
+        sale_item.quantity -= item["quantity"]
+        sale_item.total_price = sale_item.quantity * stock.selling_price
+        session.add(return_entry)
+        movements.append({"stock_id": stock.id, "change": item["quantity"], "return": return_entry})
+        delta = {"day": sale_item.sale.date.date(), "stock_id": stock.id, "items_returned": item["quantity"]}
+        if sale_item.sale_id not in cancelled:
+            delta.update(items_sold=-item["quantity"], revenue=sale_item.total_price - previous_total)
+        summary_deltas.append(delta)
+    add_to_sales_summary(summary_deltas)
+    session.flush()
+    record_stock_movements("return", [{"stock_id": movement["stock_id"], "change": movement["change"],
+                                       "reference_id": movement["return"].id} for movement in movements])
+    return {sale_item.sale_id for sale_item in sale_items.values()}
+
+def complete_pickup(pickup_items, customer_name, customer_mobile, customer_address):
+    # Take stock first so a short line fails before the sale and delivery are written
+    stocks = load_stocks(item["stock_id"] for item in pickup_items)
+    decrement_stock(pickup_items, stocks)
+    customer_mobile = customer_mobile.strip()
+    customer_id = save_customer(customer_name, customer_mobile, customer_address)
+    # Create Sale
+    sale = Sale(
+        customer_id=customer_id,
+        customer_name=customer_name,
+        customer_mobile=customer_mobile,
+        customer_address=customer_address
+    )
+    session.add(sale)
+    session.flush()
+    # Create Delivery
+    delivery = Delivery(
+        sale_id=sale.id,
+        customer_id=customer_id,
+        status="Picked",
+        customer_name=customer_name,
+        customer_mobile=customer_mobile,
+        customer_address=customer_address
+    )
+    session.add(delivery)
+    session.flush()
+    # Process items
+    summary_deltas = []
+    for item in pickup_items:
+        # Create SaleItem
+        sale_item = SaleItem(
+            sale_id=sale.id,
+            stock_id=item["stock_id"],
+            quantity=item["quantity"],
+            total_price=item["quantity"] * stocks[item["stock_id"]].selling_price
+        )
+        session.add(sale_item)
+        # Create DeliveryItem; the relationship fills in sale_item_id at flush time
+        delivery_item = DeliveryItem(
+            delivery_id=delivery.id,
+            sale_item=sale_item,
+            quantity=item["quantity"]
+        )
+        session.add(delivery_item)
+        summary_deltas.append({"day": sale.date.date(), "stock_id": sale_item.stock_id,
+                               "items_sold": sale_item.quantity, "revenue": sale_item.total_price})
+    add_to_sales_summary(summary_deltas, sale_days=[sale.date.date()])
+    record_stock_movements("pickup", [{"stock_id": item["stock_id"], "change": -item["quantity"], "reference_id": delivery.id}
+                                      for item in pickup_items])
+    return delivery.id
+
+def cancel_delivery(delivery_id, reason):
+    delivery = session.get(Delivery, delivery_id)
+    if delivery.status == "Cancelled":
+        raise ValueError(f"Delivery {delivery.id} is already cancelled.")
+    delivery.status = "Cancelled"
+    delivery.reason = reason
+    sale_day = session.get(Sale, delivery.sale_id).date.date()
+    # Update stock quantities
+    delivery_items = (session.query(DeliveryItem)
+                      .options(joinedload(DeliveryItem.sale_item).joinedload(SaleItem.stock))
+                      .filter_by(delivery_id=delivery.id).all())
+    for item in delivery_items:
+        item.sale_item.stock.quantity += item.quantity
+    add_to_sales_summary([
+        {"day": sale_day, "stock_id": item.sale_item.stock_id, "items_cancelled": item.quantity,
+         "items_sold": -item.sale_item.quantity, "revenue": -item.sale_item.total_price}
+        for item in delivery_items
+    ])
+    record_stock_movements("cancel", [{"stock_id": item.sale_item.stock_id, "change": item.quantity, "reference_id": delivery.id}
+                                      for item in delivery_items])
+    return delivery.sale_id
+
+# Stock catalogue behind the item pickers, cached across reruns and cleared after every stock write
+@st.cache_data
+def load_stock_catalogue():
+    import pandas as pd
+    return pd.read_sql(
+        select(Stock.id, Stock.name, Stock.selling_price, Stock.mrp, Stock.quantity, Stock.sku, Stock.reorder_level)
+        .order_by(Stock.id),
+        engine,
+        index_col="id",
+    )
+
+def invalidate_stock_catalogue():
+    load_stock_catalogue.clear()
+    reorder_suggestions.clear()
+
+# Bulk GRN import: the file is read in chunks, every row is validated against one preloaded
+# stock lookup, and GRN rows plus stock increments are written with executemany statements.
+IMPORT_CHUNK_SIZE = int(os.environ.get("INAYA_IMPORT_CHUNK_SIZE", "5000"))
+
+def read_import_chunks(uploaded_file, chunk_size=IMPORT_CHUNK_SIZE):
+    import pandas as pd
+    uploaded_file.seek(0)
+    if uploaded_file.name.lower().endswith((".xlsx", ".xls")):
+        sheet = pd.read_excel(uploaded_file)
+        return len(sheet), (sheet.iloc[start:start + chunk_size] for start in range(0, len(sheet), chunk_size))
+    total_rows = max(uploaded_file.getvalue().count(b"\n") - 1, 1)
+    return total_rows, pd.read_csv(uploaded_file, chunksize=chunk_size)
+
+def stock_name_lookup(catalogue):
+    import pandas as pd
+    # Only names that identify exactly one stock item can be matched
+    names = catalogue["name"].str.strip().str.casefold()
+    unique = ~names.duplicated(keep=False)
+    return pd.Series(catalogue.index[unique], index=names[unique])
+
+def resolve_grn_chunk(chunk, catalogue, name_lookup):
+    import pandas as pd
+    chunk = chunk.rename(columns=lambda column: str(column).strip().lower().replace(" ", "_"))
+    if "quantity" not in chunk or ("stock_id" not in chunk and "name" not in chunk):
+        raise ValueError("Import file needs a 'quantity' column and a 'stock_id' or 'name' column.")
+    stock_ids = pd.to_numeric(chunk["stock_id"], errors="coerce") if "stock_id" in chunk else pd.Series(float("nan"), index=chunk.index)
+    if "name" in chunk:
+        stock_ids = stock_ids.fillna(chunk["name"].astype(str).str.strip().str.casefold().map(name_lookup))
+    quantities = pd.to_numeric(chunk["quantity"], errors="coerce")
+    unknown_item = ~stock_ids.isin(catalogue.index)
+    bad_quantity = quantities.isna() | (quantities < 1) | (quantities % 1 != 0)
+    errors = pd.DataFrame({
+        "Row": chunk.index + 2,  # 1-based, after the header row
+        "Error": bad_quantity.map({True: "Quantity must be a whole number of at least 1.", False: None}),
+    })
+    errors.loc[unknown_item, "Error"] = "Unknown or ambiguous item."
+    valid = ~(unknown_item | bad_quantity)
+    rows = pd.DataFrame({"stock_id": stock_ids[valid].astype(int), "quantity": quantities[valid].astype(int)})
+    return rows, errors[~valid]
+
+def import_grn_file(uploaded_file, dry_run=False, on_progress=None):
+    import pandas as pd
+    catalogue = load_stock_catalogue()
+    name_lookup = stock_name_lookup(catalogue)
+    stock_table = Stock.__table__
+    received_at = datetime.utcnow()
+    summary = {"rows": 0, "valid_rows": 0, "quantity": 0, "items": set(), "errors": []}
+    total_rows, chunks = read_import_chunks(uploaded_file)
+    for chunk in chunks:
+        rows, errors = resolve_grn_chunk(chunk, catalogue, name_lookup)
+        summary["rows"] += len(chunk)
+        summary["valid_rows"] += len(rows)
+        summary["quantity"] += int(rows["quantity"].sum())
+        summary["items"].update(rows["stock_id"].tolist())
+        summary["errors"].append(errors)
+        if not dry_run and not rows.empty:
+            session.execute(insert(GRN), rows.assign(date=received_at).to_dict("records"))
+            increments = rows.groupby("stock_id", as_index=False)["quantity"].sum()
+            session.execute(
+                update(stock_table)
+                .where(stock_table.c.id == bindparam("stock_id"))
+                .values(quantity=stock_table.c.quantity + bindparam("added")),
+                increments.rename(columns={"quantity": "added"}).to_dict("records"),
+            )
+            record_stock_movements("grn_import", increments.rename(columns={"quantity": "change"}).to_dict("records"))
+        if on_progress:
+            on_progress(summary["rows"], total_rows)
+    summary["errors"] = pd.concat(summary["errors"], ignore_index=True) if summary["errors"] else pd.DataFrame(columns=["Row", "Error"])
+    if not dry_run and not summary["errors"].empty:
+        # All or nothing: the caller rolls back every chunk already written
+        raise ValueError(f"{len(summary['errors'])} rows failed validation, so nothing was imported. Run a dry run to see them.")
+    return summary
+
+# Bulk stock catalogue upsert keyed by SKU (when the file has one) or item name. Rows are validated
+# in pandas first, then written as batched INSERT ... ON CONFLICT(id) DO UPDATE statements: rows that
+# match an existing item update its prices, the rest are inserted as new items.
+STOCK_UPSERT_BATCH_SIZE = 500
+
+def upsert_stock_catalogue(frame, dry_run=False):
+    import pandas as pd
+    frame = frame.rename(columns=lambda column: str(column).strip().lower().replace(" ", "_")).reset_index(drop=True)
+    key = "sku" if "sku" in frame else "name"
+    if key not in frame or "selling_price" not in frame or "mrp" not in frame:
+        raise ValueError("Stock file needs 'selling_price' and 'mrp' columns and a 'sku' or 'name' column.")
+    catalogue = load_stock_catalogue()
+    keys = frame[key].astype("string").str.strip()
+    if key == "sku":
+        known = catalogue.dropna(subset=["sku"])
+        stock_ids = keys.map(pd.Series(known.index, index=known["sku"]))
+        ambiguous = pd.Series(False, index=frame.index)
+    else:
+        keys = keys.str.casefold()
+        stock_ids = keys.map(stock_name_lookup(catalogue))
+        ambiguous = stock_ids.isna() & keys.isin(catalogue["name"].str.strip().str.casefold())
+    names = frame["name"].astype("string").str.strip() if "name" in frame else pd.Series(pd.NA, index=frame.index, dtype="string")
+    selling_prices = pd.to_numeric(frame["selling_price"], errors="coerce")
+    mrps = pd.to_numeric(frame["mrp"], errors="coerce")
+    quantities = pd.to_numeric(frame["quantity"], errors="coerce") if "quantity" in frame else pd.Series(0, index=frame.index)
+    # Without a reorder_level value new items start at 0 and existing items keep theirs
+    given_levels = frame["reorder_level"] if "reorder_level" in frame else pd.Series(None, index=frame.index, dtype="object")
+    reorder_levels = pd.to_numeric(given_levels, errors="coerce")
+    bad_levels = given_levels.notna() & (reorder_levels.isna() | (reorder_levels < 0) | (reorder_levels % 1 != 0))
+    reorder_levels = reorder_levels.fillna(stock_ids.map(catalogue["reorder_level"])).fillna(0)
+
+    # Later checks overwrite earlier ones, so each row reports its most basic problem
+    checks = [
+        (quantities.isna() | (quantities < 0) | (quantities % 1 != 0), "Quantity must be a whole number of at least 0."),
+        (bad_levels, "Reorder level must be a whole number of at least 0."),
+        (mrps < selling_prices, "MRP cannot be less than Selling Price."),
+        (selling_prices.isna() | (selling_prices <= 0) | mrps.isna() | (mrps <= 0), "Selling price and MRP are required."),
+        (stock_ids.isna() & (names.isna() | (names == "")), "New items need a name."),
+        (ambiguous, "Item name matches more than one stock item."),
+        (keys.duplicated(keep=False), f"Duplicate {key} in file."),
+        (keys.isna() | (keys == ""), f"Missing {key}."),
+    ]
+    errors = pd.Series(None, index=frame.index, dtype="object")
+    for failed, message in checks:
+        errors[failed.fillna(True).astype(bool)] = message
+    valid = errors.isna()
+    summary = {
+        "rows": len(frame),
+        "inserted": int((valid & stock_ids.isna()).sum()),
+        "updated": int((valid & stock_ids.notna()).sum()),
+        "errors": pd.DataFrame({"Row": frame.index[~valid] + 2, "Error": errors[~valid]}),
+    }
+    if dry_run:
+        return summary
+    if not summary["errors"].empty:
+        raise ValueError(f"{len(summary['errors'])} rows failed validation, so nothing was imported. Run a dry run to see them.")
+
+    records = pd.DataFrame({
+        "id": stock_ids.astype("Int64"),
+        "name": names.fillna(stock_ids.map(catalogue["name"])),
+        "quantity": quantities.astype(int),
+        "reorder_level": reorder_levels.astype("Int64"),
+        "selling_price": selling_prices,
+        "mrp": mrps,
+        "sku": frame["sku"].astype("string").str.strip() if "sku" in frame else pd.Series(pd.NA, index=frame.index, dtype="string"),
+    }).astype(object).where(lambda records: records.notna(), None).to_dict("records")
+    statement = sqlite_insert(Stock.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Stock.__table__.c.id],
+        set_={
+            "selling_price": statement.excluded.selling_price,
+            "mrp": statement.excluded.mrp,
+            "sku": func.coalesce(statement.excluded.sku, Stock.__table__.c.sku),
+            "reorder_level": statement.excluded.reorder_level,
+        },
+    )
+    for start in range(0, len(records), STOCK_UPSERT_BATCH_SIZE):
+        session.execute(statement, records[start:start + STOCK_UPSERT_BATCH_SIZE])
+    # Existing items keep their quantity, so only the inserted ones need ledger rows
+    open_stock_ledger(session, "stock_import")
+    return summary
 
-# Configure pdfkit after database setup
-pdfkit_config, wkhtmltopdf_error = configure_pdfkit()
+# Invoice models built from database rows; the invoice backends turn them into PDFs
+def sale_invoice(sale):
+    return Invoice(
+        title="Sale Invoice",
+        details=[
+            InvoiceDetail("Sale ID", sale.id),
+            InvoiceDetail("Date", sale.date.strftime("%Y-%m-%d")),
+            InvoiceDetail("Customer", sale.customer_name or "N/A"),
+            InvoiceDetail("Mobile", sale.customer_mobile or "N/A"),
+            InvoiceDetail("Address", sale.customer_address or "N/A", full_width=True),
+        ],
+        lines=[
+            InvoiceLine(item.stock.name, item.quantity, item.stock.selling_price, item.total_price, mrp=item.stock.mrp)
+            for item in sale.items
+        ],
+    )
+
+def grn_invoice(grn, stock):
+    return Invoice(
+        title="Goods Received Note (GRN)",
+        details=[InvoiceDetail("GRN ID", grn.id), InvoiceDetail("Date", grn.date.strftime("%Y-%m-%d"))],
+        lines=[InvoiceLine(stock.name, grn.quantity, stock.selling_price, grn.quantity * stock.selling_price, mrp=stock.mrp)],
+        total_heading="Total Selling Price",
+        show_grand_total=False,
+    )
+
+def return_invoice(return_entry, stock):
+    return Invoice(
+        title="Return Invoice",
+        details=[
+            InvoiceDetail("Return ID", return_entry.id),
+            InvoiceDetail("Date", return_entry.date.strftime("%Y-%m-%d")),
+            InvoiceDetail("Reason", return_entry.reason, full_width=True),
+        ],
+        lines=[InvoiceLine(stock.name, return_entry.quantity, stock.selling_price, return_entry.quantity * stock.selling_price)],
+        show_mrp=False,
+        total_heading="Total Amount",
+        show_grand_total=False,
+    )
+
+def delivery_invoice(delivery, delivery_items):
+    return Invoice(
+        title="Delivery Invoice",
+        details=[
+            InvoiceDetail("Delivery ID", delivery.id),
+            InvoiceDetail("Date", delivery.date.strftime("%Y-%m-%d")),
+            InvoiceDetail("Customer", delivery.customer_name or "N/A"),
+            InvoiceDetail("Mobile", delivery.customer_mobile or "N/A"),
+            InvoiceDetail("Address", delivery.customer_address or "N/A", full_width=True),
+            InvoiceDetail("Status", delivery.status),
+            InvoiceDetail("Sale ID", delivery.sale_id),
+        ],
+        lines=[
+            InvoiceLine(item.sale_item.stock.name, item.quantity, item.sale_item.stock.selling_price,
+                        item.quantity * item.sale_item.stock.selling_price, mrp=item.sale_item.stock.mrp)
+            for item in delivery_items
+        ],
+    )
+
+# Batch invoice export. Sales are streamed from the database in keyset-paginated chunks through a
+# dedicated session, so only one chunk of ORM objects, invoices and PDF bytes is held at a time.
+def iter_sale_chunks(export_session, start_date, end_date, chunk_size=EXPORT_CHUNK_SIZE):
+    last_id = 0
+    while True:
+        export_session.expunge_all()  # drop the previous chunk before loading the next
+        sales = (export_session.query(Sale)
+                 .options(selectinload(Sale.items).joinedload(SaleItem.stock))
+                 .filter(Sale.date >= start_date, Sale.date < end_date + timedelta(days=1), Sale.id > last_id)
+                 .order_by(Sale.id)
+                 .limit(chunk_size)
+                 .all())
+        if not sales:
+            return
+        yield sales
+        last_id = sales[-1].id
+
+# Write every sale invoice in the date range to a temp file: a ZIP of per-sale PDFs rendered in
+# parallel, or one merged PDF written by the backend from the stream of invoice chunks.
+# Returns the file path and the number of invoices; the caller deletes the file.
+# A merged PDF is built by a single wkhtmltopdf run or a single reportlab canvas, whose memory grows
+# with every page, so it is limited to MERGED_EXPORT_LIMIT invoices. The ZIP has no limit.
+def export_sale_invoices(start_date, end_date, merged=False, on_progress=None):
+    export_session = Session.session_factory()
+    try:
+        total = export_session.query(func.count(Sale.id)).filter(
+            Sale.date >= start_date, Sale.date < end_date + timedelta(days=1)
+        ).scalar()
+        if not total:
+            return None, 0
+        if merged and total > MERGED_EXPORT_LIMIT:
+            raise ValueError(f"{total} sales in the selected range, but a merged PDF holds at most {MERGED_EXPORT_LIMIT} "
+                             "invoices. Export a ZIP or choose a shorter range.")
+        fd, path = tempfile.mkstemp(prefix="sale_invoices_", suffix=".pdf" if merged else ".zip")
+        os.close(fd)
+        done = 0
+        try:
+            if merged:
+                def invoice_chunks():
+                    nonlocal done
+                    for sales in iter_sale_chunks(export_session, start_date, end_date):
+                        yield [sale_invoice(sale) for sale in sales]
+                        done += len(sales)
+                        if on_progress:
+                            on_progress(done, total)
+                invoice_backend.render_many(invoice_chunks(), path)
+            else:
+                # Rendered straight through the backend: a bulk export would only push every other
+                # document out of the invoice cache, and pay for cache upkeep on each invoice
+                with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive, \
+                        ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="invoice-export") as pool:
+                    for sales in iter_sale_chunks(export_session, start_date, end_date):
+                        futures = [(sale.id, pool.submit(invoice_backend.render, sale_invoice(sale))) for sale in sales]
+                        for sale_id, future in futures:
+                            archive.writestr(f"sale_{sale_id}.pdf", future.result())
+                            done += 1
+                            if on_progress:
+                                on_progress(done, total)
+        except BaseException:
+            # Also covers Streamlit stopping the script mid-export, which is not an Exception
+            os.remove(path)
+            raise
+        return path, done
+    finally:
+        export_session.close()
+
+# Paginated report table: filters become WHERE clauses and only one page is fetched from the database.
+# `format_page` turns the raw page (one column per selected expression) into the displayed DataFrame.
+REPORT_PAGE_SIZE = int(os.environ.get("INAYA_REPORT_PAGE_SIZE", "50"))
+
+def paginated_report(key, query, format_page, order_by, date_column=None, name_columns=(), status_filters=None):
+    import pandas as pd
+    filter_cols = st.columns(3)
+    if date_column is not None:
+        with filter_cols[0]:
+            date_range = st.date_input("Date Range", value=(), key=f"{key}_date_range")
+        if len(date_range) == 2:
+            query = query.where(date_column >= date_range[0], date_column < date_range[1] + timedelta(days=1))
+    if name_columns:
+        with filter_cols[1]:
+            name_filter = st.text_input("Search Name", key=f"{key}_name_filter").strip()
+        if name_filter:
+            query = query.where(or_(*[column.ilike(f"%{name_filter}%") for column in name_columns]))
+    if status_filters:
+        with filter_cols[2]:
+            status = st.selectbox("Status", ["All"] + list(status_filters.keys()), key=f"{key}_status_filter")
+        if status != "All":
+            query = query.where(status_filters[status])
+
+    total = session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+    page_count = max(1, math.ceil(total / REPORT_PAGE_SIZE))
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key=f"{key}_page")
+    offset = (page - 1) * REPORT_PAGE_SIZE
+    page_query = query.order_by(*order_by).limit(REPORT_PAGE_SIZE).offset(offset)
+    df = format_page(pd.read_sql(page_query, session.connection()))
+    st.dataframe(df, use_container_width=True)
+    st.caption(f"Showing {min(offset + 1, total)}-{min(offset + REPORT_PAGE_SIZE, total)} of {total}")
+    return df
+
+# Sales analytics, aggregated in SQL over the daily summary tables rather than the raw sale history
+def revenue_by_day(start_date, end_date):
+    import pandas as pd
+    return pd.read_sql(
+        select(DailySalesSummary.day, DailySalesSummary.revenue, DailySalesSummary.sales_count)
+        .where(DailySalesSummary.day >= start_date, DailySalesSummary.day <= end_date)
+        .order_by(DailySalesSummary.day),
+        session.connection(),
+    )
+
+# One row per item sold in the range. Discount is what the kept items would have fetched at the
+# item's current MRP minus the revenue actually recorded for them.
+def item_sales_analytics(start_date, end_date):
+    import pandas as pd
+    items_sold = func.sum(DailyItemSales.items_sold)
+    revenue = func.sum(DailyItemSales.revenue)
+    stats = pd.read_sql(
+        select(Stock.name, items_sold.label("items_sold"), func.sum(DailyItemSales.items_returned).label("items_returned"),
+               revenue.label("revenue"), (items_sold * Stock.mrp - revenue).label("discount"))
+        .join(Stock, DailyItemSales.stock_id == Stock.id)
+        .where(DailyItemSales.day >= start_date, DailyItemSales.day <= end_date)
+        .group_by(DailyItemSales.stock_id, Stock.name, Stock.mrp),
+        session.connection(),
+    )
+    units = stats["items_sold"] + stats["items_returned"]
+    stats["return_rate"] = (stats["items_returned"] / units.where(units > 0)).fillna(0.0) * 100
+    return stats
+
+# Low-stock alerting and reorder suggestions; see low_stock_query() for the indexed lookup
+REORDER_HISTORY_DAYS = int(os.environ.get("INAYA_REORDER_HISTORY_DAYS", "28"))
+REORDER_SHORT_WINDOW = int(os.environ.get("INAYA_REORDER_SHORT_WINDOW", "7"))
+REORDER_COVER_DAYS = int(os.environ.get("INAYA_REORDER_COVER_DAYS", "14"))
+REORDER_CACHE_TTL = int(os.environ.get("INAYA_REORDER_CACHE_TTL", "300"))  # seconds
+
+def count_low_stock():
+    return session.scalar(select(func.count()).select_from(low_stock_query().subquery()))
+
+# Reorder suggestions from the last REORDER_HISTORY_DAYS of item sales, taken from the daily item
+# summary (SaleItem quantities net of returns and cancelled deliveries). SQL sums each item's sales
+# over the whole window and over its latest REORDER_SHORT_WINDOW days; velocity is the higher of the
+# two daily averages, so a recent rush is not averaged away. The suggested GRN quantity brings stock
+# up to the reorder level plus REORDER_COVER_DAYS of sales at that velocity. Items already at or below
+# their level are listed even without recent sales.
+# Every widget change reruns all Inventory tabs, so the report is cached process-wide for
+# REORDER_CACHE_TTL seconds and cleared with the stock catalogue after every stock write.
+@st.cache_data(ttl=REORDER_CACHE_TTL)
+def reorder_suggestions(today=None):
+    import pandas as pd
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=REORDER_HISTORY_DAYS - 1)
+    recent_start = today - timedelta(days=REORDER_SHORT_WINDOW - 1)
+    sold = func.max(DailyItemSales.items_sold, 0)
+    with engine.connect() as conn:
+        history = pd.read_sql(
+            select(DailyItemSales.stock_id, func.sum(sold).label("sold"),
+                   func.sum(case((DailyItemSales.day >= recent_start, sold), else_=0)).label("recent_sold"))
+            .where(DailyItemSales.day >= start, DailyItemSales.day <= today)
+            .group_by(DailyItemSales.stock_id),
+            conn,
+            index_col="stock_id",
+        )
+        stock = pd.read_sql(select(Stock.id, Stock.name, Stock.quantity, Stock.reorder_level), conn, index_col="id")
+    report = stock.join(history).fillna({"sold": 0, "recent_sold": 0})
+    recent = report["recent_sold"] / REORDER_SHORT_WINDOW
+    average = report["sold"] / REORDER_HISTORY_DAYS
+    report["velocity"] = recent.where(recent > average, average)
+    report["days_left"] = report["quantity"] / report["velocity"].where(report["velocity"] > 0)
+    shortfall = report["reorder_level"] + report["velocity"] * REORDER_COVER_DAYS - report["quantity"]
+    report["suggested"] = (-(-shortfall // 1)).clip(lower=0).astype(int)  # whole units, rounded up
+    report["low"] = (report["reorder_level"] > 0) & (report["quantity"] <= report["reorder_level"])
+    return report[(report["suggested"] > 0) | report["low"]].sort_values(["days_left", "suggested"], ascending=[True, False], na_position="last")
+
+# Whether a search term can also be looked up as a row ID: ASCII digits only, since str.isdigit()
+# accepts characters such as "²" that int() rejects, and short enough for SQLite's 64-bit integers
+def is_id_term(term):
+    return term.isascii() and term.isdigit() and len(term) <= 18
+
+# Sale finder for the Return Item tab. Each search term runs indexed lookups by sale ID, mobile
+# prefix and name prefix, each with a LIMIT; results are remembered per browser session.
+SALE_SEARCH_LIMIT = 20
+SALE_SEARCH_CACHE_SIZE = 50
+
+def search_sales(term):
+    columns = (Sale.id, Sale.customer_name, Sale.customer_mobile, Sale.date)
+    if not term:
+        queries = [select(*columns).order_by(Sale.id.desc()).limit(SALE_SEARCH_LIMIT)]
+    else:
+        queries = [
+            select(*columns).where(prefix_match(Sale.customer_mobile, term)).order_by(Sale.customer_mobile).limit(SALE_SEARCH_LIMIT),
+            select(*columns).where(prefix_match(Sale.customer_name.collate("NOCASE"), term))
+            .order_by(Sale.customer_name.collate("NOCASE")).limit(SALE_SEARCH_LIMIT),
+        ]
+        if is_id_term(term):
+            queries.insert(0, select(*columns).where(Sale.id == int(term)))
+    matches = {}
+    for query in queries:
+        for row in session.execute(query):
+            matches.setdefault(row.id, row)
+    return sorted(matches.values(), key=lambda row: row.id, reverse=True)[:SALE_SEARCH_LIMIT]
+
+# Cached results are tagged with the newest sale ID when they were fetched and are refetched once
+# any counter records a sale. The empty term (the latest sales) is never cached.
+def cached_sale_search(term):
+    term = term.strip()
+    if not term:
+        return search_sales(term)
+    latest_sale_id = session.execute(select(func.max(Sale.id))).scalar()
+    cache = st.session_state.sale_search_cache
+    if term not in cache or cache[term][0] != latest_sale_id:
+        cache.pop(term, None)
+        if len(cache) >= SALE_SEARCH_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[term] = (latest_sale_id, search_sales(term))
+    return cache[term][1]
+
+# Customer autocomplete for checkout: indexed mobile and name prefix lookups, newest customers first
+CUSTOMER_SEARCH_LIMIT = 10
+
+def find_customers(term):
+    matches = {}
+    for condition in (prefix_match(Customer.mobile, term), prefix_match(Customer.name.collate("NOCASE"), term)):
+        for customer in session.scalars(select(Customer).where(condition).limit(CUSTOMER_SEARCH_LIMIT)):
+            matches.setdefault(customer.id, customer)
+    return sorted(matches.values(), key=lambda customer: customer.id, reverse=True)[:CUSTOMER_SEARCH_LIMIT]
+
+def customer_history(customer_id):
+    return session.execute(
+        select(func.count(Sale.id), func.max(Sale.date)).where(Sale.customer_id == customer_id)
+    ).one()
+
+# Search box above a checkout form; returns the chosen saved customer (or None) to prefill the form
+def customer_picker(key):
+    term = st.text_input("Find Customer", placeholder="Mobile number or name", key=f"{key}_customer_search").strip()
+    if not term:
+        return None
+    options = {f"{customer.name} ({customer.mobile})": customer for customer in find_customers(term)}
+    if not options:
+        st.caption("No saved customer matches; enter the details below.")
+        return None
+    choice = st.selectbox("Saved Customer", options=["New customer"] + list(options.keys()), key=f"{key}_customer_choice")
+    customer = options.get(choice)
+    if customer:
+        purchases, last_purchase = customer_history(customer.id)
+        if purchases:
+            st.caption(f"{purchases} previous purchases, last on {last_purchase.strftime('%Y-%m-%d')}.")
+    return customer
+
+# Item search for the stock pickers, served by the stock_search FTS5 index. Every word of the term
+# must prefix-match a word of the item name or SKU, and matches come back in bm25 order; an all-digit
+# term also matches the item ID exactly.
+STOCK_SEARCH_LIMIT = 20
+
+def stock_match_expression(term):
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", term))
+
+def search_stock(term):
+    matches = []
+    if is_id_term(term):
+        matches.extend(session.execute(select(Stock.id, Stock.name).where(Stock.id == int(term))).all())
+    expression = stock_match_expression(term)
+    if expression:
+        matches.extend(session.execute(text("""
+            SELECT stock.id, stock.name
+            FROM (SELECT rowid, rank FROM stock_search WHERE stock_search MATCH :expression ORDER BY rank LIMIT :limit) AS hits
+            JOIN stock ON stock.id = hits.rowid
+            ORDER BY hits.rank
+        """), {"expression": expression, "limit": STOCK_SEARCH_LIMIT}).all())
+    return list(dict(matches).items())[:STOCK_SEARCH_LIMIT]
+
+# Search box plus ranked matches, placed above an item form; returns the chosen stock ID or None
+def stock_picker(key, label="Select Item"):
+    term = st.text_input("Find Item", placeholder="Item name, SKU or ID", key=f"{key}_stock_search").strip()
+    if not term:
+        st.caption("Type part of an item name, SKU or ID to choose an item.")
+        return None
+    options = {f"{name} (ID: {stock_id})": stock_id for stock_id, name in search_stock(term)}
+    if not options:
+        st.caption("No items match.")
+        return None
+    choice = st.selectbox(label, options=list(options.keys()), key=f"{key}_stock_choice")
+    return options[choice]
+
+# Users by id, shared by every session. Reloaded at most every USER_CACHE_TTL seconds and cleared
+# whenever this process creates, activates or deactivates a user.
+@st.cache_data(ttl=USER_CACHE_TTL)
+def load_user_directory():
+    with engine.connect() as conn:
+        rows = conn.execute(select(User.id, User.name, User.email, User.role, User.is_active)).all()
+    return {row.id: {"id": row.id, "name": row.name, "email": row.email, "role": row.role,
+                     "is_active": bool(row.is_active)} for row in rows}
+
+def invalidate_user_directory():
+    load_user_directory.clear()
+
+def set_user_active(user_id, is_active):
+    session.execute(update(User).where(User.id == user_id).values(is_active=is_active))
+
+# Re-check the logged-in user against the cached directory on every rerun. A deactivated user is
+# logged out on their next interaction, at most USER_CACHE_TTL seconds after another process
+# deactivated them; role and name changes are picked up the same way.
+def revalidate_session_user():
+    user = load_user_directory().get(st.session_state.user["id"])
+    if user is None or not user["is_active"]:
+        return False
+    st.session_state.user = {key: user[key] for key in ("id", "name", "email", "role")}
+    return True
+
+MENU_PAGES = (("Inventory Management", "box"), ("Sale Management", "cart"), ("Delivery Management", "truck"))
+ADMIN_MENU_PAGES = (("Sales Analytics", "graph-up"), ("User Management", "people"))
+
+# Sidebar (pages, icons) per role, as plain tuples so no caller can change a shared menu
+def build_menu(pages):
+    return tuple(page for page, _ in pages), tuple(icon for _, icon in pages)
+
+STAFF_MENU = build_menu(MENU_PAGES)
+ADMIN_MENU = build_menu(MENU_PAGES + ADMIN_MENU_PAGES)
 
 # Initialize session state
 if "user" not in st.session_state:
@@ -277,6 +1769,10 @@ if "pickup_items" not in st.session_state:
     st.session_state.pickup_items = []
 if "grn_items" not in st.session_state:
     st.session_state.grn_items = []
+if "invoice_jobs" not in st.session_state:
+    st.session_state.invoice_jobs = {}
+if "sale_search_cache" not in st.session_state:
+    st.session_state.sale_search_cache = {}
 
 # Email validation
 def is_valid_email(email):
@@ -303,29 +1799,37 @@ def login_page():
             elif not is_valid_email(email):
                 st.error("Invalid email format.")
             else:
-                user = session.query(User).filter_by(email=email, is_active=True).first()
-                if user and bcrypt.checkpw(password.encode("utf-8"), user.password.encode("utf-8")):
-                    st.session_state.user = {"id": user.id, "name": user.name, "email": user.email, "role": user.role}
-                    st.session_state.grn_items = []  # Reset GRN items on login
-                    st.success(f"Welcome, {user.name}!")
-                    st.rerun()
+                wait = login_throttle(email)
+                if wait:
+                    st.error(f"Too many login attempts. Please try again in {math.ceil(wait)} seconds.")
                 else:
-                    st.error("Invalid email or password.")
+                    user = session.query(User).filter_by(email=email, is_active=True).first()
+                    if user and verify_password(password, user.password):
+                        st.session_state.user = {"id": user.id, "name": user.name, "email": user.email, "role": user.role}
+                        st.session_state.grn_items = []  # Reset GRN items on login
+                        st.success(f"Welcome, {user.name}!")
+                        st.rerun()
+                    else:
+                        st.error("Invalid email or password.")
 
 # Logout function
-def logout():
+def clear_user_session():
     st.session_state.user = None
     st.session_state.sale_items = []
     st.session_state.return_items = []
     st.session_state.pickup_items = []
     st.session_state.grn_items = []
+
+def logout():
+    clear_user_session()
     st.success("Logged out successfully!")
     st.rerun()
 
 # Main application
 def main_app():
-    if wkhtmltopdf_error:
-        st.warning(wkhtmltopdf_error)
+    import pandas as pd
+    if invoice_backend_error:
+        st.warning(invoice_backend_error)
     
     if migration_messages:
         with st.expander("Database Migration Log"):
@@ -345,14 +1849,12 @@ def main_app():
         if st.button("Logout"):
             logout()
         
-        menu_options = ["Inventory Management", "Sale Management", "Delivery Management"]
-        if st.session_state.user["role"] == "Admin":
-            menu_options.append("User Management")
+        menu_options, menu_icons = ADMIN_MENU if st.session_state.user["role"] == "Admin" else STAFF_MENU
         
         selected = option_menu(
             "Main Menu",
             menu_options,
-            icons=["box", "cart", "truck", "people"],
+            icons=menu_icons,
             menu_icon="shop",
             default_index=0,
             styles={
@@ -363,15 +1865,20 @@ def main_app():
 
     if selected == "Inventory Management":
         st.header("Inventory Management")
+        low_stock_count = count_low_stock()
+        if low_stock_count:
+            st.warning(f"Items at or below their reorder level: {low_stock_count}. See Reorder Suggestions under Reports.")
         tab1, tab2, tab3 = st.tabs(["Create Stock", "Create GRN", "Reports"])
 
         with tab1:
             st.subheader("Create Stock")
             with st.form("create_stock_form"):
                 name = st.text_input("Item Name")
+                sku = st.text_input("SKU (optional)")
                 quantity = st.number_input("Quantity", min_value=0, step=1)
                 selling_price = st.number_input("Selling Price (Rs.)", min_value=0.0, step=0.01)
                 mrp = st.number_input("MRP (Rs.)", min_value=0.0, step=0.01)
+                reorder_level = st.number_input("Reorder Level (0 for no alert)", min_value=0, step=1)
                 if st.form_submit_button("Add Stock"):
                     if not name or not selling_price or not mrp:
                         st.error("All fields are required.")
@@ -380,41 +1887,62 @@ def main_app():
                     elif quantity < 0:
                         st.error("Quantity cannot be negative.")
                     else:
-                        stock = Stock(name=name, quantity=quantity, selling_price=selling_price, mrp=mrp)
-                        session.add(stock)
                         try:
-                            session.commit()
+                            commit_with_retry(create_stock, name, sku.strip() or None, quantity, selling_price, mrp, reorder_level)
+                            invalidate_stock_catalogue()
                             st.success("Stock created successfully!")
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Error creating stock: {str(e)}")
 
+            st.subheader("Bulk Stock Import")
+            st.caption("Upload a CSV or Excel file with 'selling_price' and 'mrp' columns, a 'sku' or 'name' key column, "
+                       "and optionally 'quantity' for new items and 'reorder_level'. Existing items keep their quantity; "
+                       "prices and any given reorder levels are updated.")
+            stock_file = st.file_uploader("Stock File", type=["csv", "xlsx"])
+            stock_dry_run = st.checkbox("Dry run (validate only, nothing is saved)", value=True, key="stock_import_dry_run")
+            if stock_file and st.button("Import Stock File"):
+                try:
+                    _, chunks = read_import_chunks(stock_file)
+                    frame = pd.concat(chunks, ignore_index=True)
+                    if stock_dry_run:
+                        summary = upsert_stock_catalogue(frame, dry_run=True)
+                    else:
+                        summary = commit_with_retry(upsert_stock_catalogue, frame)
+                        invalidate_stock_catalogue()
+                    st.success(
+                        f"{'Validated' if stock_dry_run else 'Imported'} {summary['rows']} rows: "
+                        f"{summary['inserted']} new items, {summary['updated']} price updates."
+                    )
+                    if not summary["errors"].empty:
+                        st.error(f"{len(summary['errors'])} rows failed validation.")
+                        st.dataframe(summary["errors"], use_container_width=True)
+                except ValueError as e:
+                    st.error(str(e))
+                except Exception as e:
+                    st.error(f"Error importing stock file: {str(e)}")
+
         with tab2:
             st.subheader("Create GRN")
-            stocks = session.query(Stock).all()
-            stock_options = {f"{s.name} (ID: {s.id})": s.id for s in stocks}
+            catalogue = load_stock_catalogue()
+            stock_id = stock_picker("grn")
             with st.form("add_grn_item_form"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    stock_id = st.selectbox("Select Item", options=list(stock_options.keys()))
-                with col2:
-                    quantity = st.number_input("Quantity", min_value=1, step=1)
+                quantity = st.number_input("Quantity", min_value=1, step=1)
                 if st.form_submit_button("Add Item"):
                     if not stock_id or not quantity:
                         st.error("All fields are required.")
                     elif quantity < 1:
                         st.error("Quantity must be at least 1.")
                     else:
-                        stock = session.query(Stock).get(stock_options[stock_id])
-                        st.session_state.grn_items.append({"stock_id": stock_options[stock_id], "quantity": quantity})
-                        st.success(f"Added {quantity} of {stock.name} to GRN.")
+                        stock = catalogue.loc[stock_id]
+                        st.session_state.grn_items.append({"stock_id": stock_id, "quantity": quantity})
+                        st.success(f"Added {quantity} of {stock['name']} to GRN.")
             
             if st.session_state.grn_items:
                 st.write("Selected Items:")
-                grn_items_df = pd.DataFrame([
-                    {"Item": session.query(Stock).get(item["stock_id"]).name, "Quantity": item["quantity"]}
-                    for item in st.session_state.grn_items
-                ])
+                grn_items_df = pd.DataFrame({
+                    "Item": catalogue.loc[[item["stock_id"] for item in st.session_state.grn_items], "name"].tolist(),
+                    "Quantity": [item["quantity"] for item in st.session_state.grn_items],
+                })
                 st.dataframe(grn_items_df, use_container_width=True)
             
             with st.form("submit_grn_form"):
@@ -423,122 +1951,175 @@ def main_app():
                         st.error("No items added to GRN.")
                     else:
                         try:
-                            for item in st.session_state.grn_items:
-                                stock = session.query(Stock).get(item["stock_id"])
-                                if not stock:
-                                    st.error(f"Stock item ID {item['stock_id']} not found.")
-                                    session.rollback()
-                                    break
-                                grn = GRN(stock_id=stock.id, quantity=item["quantity"])
-                                stock.quantity += item["quantity"]
-                                session.add(grn)
-                            else:
-                                session.commit()
-                                st.session_state.grn_items = []
-                                st.success("GRN created successfully for all items!")
-                                st.rerun()
+                            commit_with_retry(submit_grn, st.session_state.grn_items)
+                            invalidate_stock_catalogue()
+                            st.session_state.grn_items = []
+                            st.success("GRN created successfully for all items!")
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Error creating GRN: {str(e)}")
 
+            st.subheader("Bulk GRN Import")
+            st.caption("Upload a CSV or Excel file with a 'quantity' column and either a 'stock_id' or a 'name' column.")
+            grn_file = st.file_uploader("GRN File", type=["csv", "xlsx"])
+            dry_run = st.checkbox("Dry run (validate only, nothing is saved)", value=True)
+            if grn_file and st.button("Import GRN File"):
+                progress = st.progress(0.0)
+                update_progress = lambda done, total: progress.progress(min(done / total, 1.0), text=f"Processed {done} of ~{total} rows")
+                try:
+                    if dry_run:
+                        summary = import_grn_file(grn_file, dry_run=True, on_progress=update_progress)
+                    else:
+                        summary = commit_with_retry(import_grn_file, grn_file, on_progress=update_progress)
+                        invalidate_stock_catalogue()
+                    st.success(
+                        f"{'Validated' if dry_run else 'Imported'} {summary['valid_rows']} of {summary['rows']} rows: "
+                        f"{summary['quantity']} units across {len(summary['items'])} items."
+                    )
+                    if not summary["errors"].empty:
+                        st.error(f"{len(summary['errors'])} rows failed validation.")
+                        st.dataframe(summary["errors"], use_container_width=True)
+                except ValueError as e:
+                    st.error(str(e))
+                except Exception as e:
+                    st.error(f"Error importing GRN file: {str(e)}")
+
         with tab3:
             st.subheader("Stock Report")
-            stocks = session.query(Stock).all()
-            df = pd.DataFrame([(s.id, s.name, s.quantity, f"Rs. {s.selling_price:.2f}", f"Rs. {s.mrp:.2f}") for s in stocks], 
-                             columns=["ID", "Name", "Quantity", "Selling Price", "MRP"])
-            st.dataframe(df, use_container_width=True)
+            paginated_report(
+                "stock_report",
+                select(Stock.id, Stock.name, Stock.quantity, Stock.reorder_level, Stock.selling_price, Stock.mrp),
+                lambda page: pd.DataFrame({
+                    "ID": page["id"],
+                    "Name": page["name"],
+                    "Quantity": page["quantity"],
+                    "Reorder Level": page["reorder_level"],
+                    "Selling Price": page["selling_price"].map("Rs. {:.2f}".format),
+                    "MRP": page["mrp"].map("Rs. {:.2f}".format),
+                }),
+                order_by=[Stock.id],
+                name_columns=[Stock.name],
+            )
 
             st.subheader("Adjust Stock")
+            stock_id = stock_picker("adjust", "Select Item to Adjust")
             with st.form("adjust_stock_form"):
-                stock_id = st.selectbox("Select Item to Adjust", options=list(stock_options.keys()))
                 new_quantity = st.number_input("New Quantity", min_value=0, step=1)
                 if st.form_submit_button("Adjust"):
-                    if new_quantity < 0:
+                    if not stock_id:
+                        st.error("Select an item to adjust.")
+                    elif new_quantity < 0:
                         st.error("New quantity cannot be negative.")
                     else:
-                        stock = session.query(Stock).get(stock_options[stock_id])
-                        stock.quantity = new_quantity
                         try:
-                            session.commit()
+                            commit_with_retry(adjust_stock, stock_id, new_quantity)
+                            invalidate_stock_catalogue()
                             st.success("Stock adjusted successfully!")
                             st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Error adjusting stock: {str(e)}")
 
+            st.subheader("Set Reorder Level")
+            stock_id = stock_picker("reorder_level")
+            with st.form("reorder_level_form"):
+                reorder_level = st.number_input("Reorder Level (0 for no alert)", min_value=0, step=1)
+                if st.form_submit_button("Save Reorder Level"):
+                    if not stock_id:
+                        st.error("Select an item first.")
+                    else:
+                        try:
+                            commit_with_retry(set_reorder_level, stock_id, reorder_level)
+                            invalidate_stock_catalogue()
+                            st.success("Reorder level saved successfully!")
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
+                        except Exception as e:
+                            st.error(f"Error saving reorder level: {str(e)}")
+
+            st.subheader("Reorder Suggestions")
+            st.caption(f"Sales velocity over the last {REORDER_HISTORY_DAYS} days; suggested quantities restore the "
+                       f"reorder level plus {REORDER_COVER_DAYS} days of sales.")
+            suggestions = reorder_suggestions()
+            if suggestions.empty:
+                st.info("No items need reordering.")
+            else:
+                st.dataframe(pd.DataFrame({
+                    "ID": suggestions.index,
+                    "Name": suggestions["name"],
+                    "Quantity": suggestions["quantity"],
+                    "Reorder Level": suggestions["reorder_level"],
+                    "Below Level": suggestions["low"].map({True: "Yes", False: ""}),
+                    "Sold per Day": suggestions["velocity"].round(2),
+                    "Days Left": suggestions["days_left"].round(1),
+                    "Suggested GRN Qty": suggestions["suggested"],
+                }), use_container_width=True)
+
+            st.subheader("Stock Ledger")
+            ledger_stock_id = stock_picker("ledger")
+            if ledger_stock_id:
+                as_of_date = st.date_input("Stock As Of (end of day)", value=datetime.utcnow().date(), key="ledger_as_of")
+                balance = stock_as_of(ledger_stock_id, datetime.combine(as_of_date + timedelta(days=1), datetime.min.time()) - timedelta(microseconds=1))
+                if balance is None:
+                    st.info(f"No stock movements recorded for this item by {as_of_date}.")
+                else:
+                    st.metric(f"Quantity on {as_of_date}", balance)
+                paginated_report(
+                    "stock_ledger",
+                    select(StockMovement.id, StockMovement.date, StockMovement.kind, StockMovement.reference_id,
+                           StockMovement.change, StockMovement.balance)
+                    .where(StockMovement.stock_id == ledger_stock_id),
+                    lambda page: pd.DataFrame({
+                        "Date": pd.to_datetime(page["date"]).dt.strftime("%Y-%m-%d %H:%M"),
+                        "Movement": page["kind"].str.replace("_", " ").str.title(),
+                        "Reference": page["reference_id"].astype("Int64"),
+                        "Change": page["change"],
+                        "Balance": page["balance"],
+                    }),
+                    order_by=[StockMovement.date.desc(), StockMovement.id.desc()],
+                    date_column=StockMovement.date,
+                )
+
             st.subheader("GRN Report")
-            grns = session.query(GRN).all()
-            grn_data = []
-            for grn in grns:
-                stock = session.query(Stock).get(grn.stock_id)
-                total_price = grn.quantity * stock.selling_price
-                grn_data.append((grn.id, stock.name, grn.quantity, 
-                                f"Rs. {stock.mrp:.2f}",
-                                f"Rs. {stock.selling_price:.2f}",
-                                f"Rs. {total_price:.2f}",
-                                grn.date.strftime("%Y-%m-%d")))
-            df_grn = pd.DataFrame(grn_data, 
-                                 columns=["GRN ID", "Item Name", "Quantity", "MRP", "Selling Price", "Total Selling Price", "Date"])
-            st.dataframe(df_grn, use_container_width=True)
+            # Single GRN-Stock join, read straight into column arrays
+            df_grn = paginated_report(
+                "grn_report",
+                select(GRN.id, Stock.name, GRN.quantity, Stock.mrp, Stock.selling_price, GRN.date)
+                .join(Stock, GRN.stock_id == Stock.id),
+                lambda page: pd.DataFrame({
+                    "GRN ID": page["id"],
+                    "Item Name": page["name"],
+                    "Quantity": page["quantity"],
+                    "MRP": page["mrp"].map("Rs. {:.2f}".format),
+                    "Selling Price": page["selling_price"].map("Rs. {:.2f}".format),
+                    "Total Selling Price": (page["quantity"] * page["selling_price"]).map("Rs. {:.2f}".format),
+                    "Date": pd.to_datetime(page["date"]).dt.strftime("%Y-%m-%d"),
+                }),
+                order_by=[GRN.id.desc()],
+                date_column=GRN.date,
+                name_columns=[Stock.name],
+            )
 
             st.subheader("GRN Invoice")
-            grn_options = {f"GRN {g.id} ({g.date.strftime('%Y-%m-%d')})": g.id for g in grns}
+            grn_options = {f"GRN {grn_id} ({grn_date})": int(grn_id) for grn_id, grn_date in zip(df_grn["GRN ID"], df_grn["Date"])}
             selected_grn = st.selectbox("Select GRN for Invoice", options=list(grn_options.keys()))
             if st.button("Generate GRN Invoice"):
                 try:
                     grn = session.query(GRN).get(grn_options[selected_grn])
                     stock = session.query(Stock).get(grn.stock_id)
-                    total_price = grn.quantity * stock.selling_price
-                    html = f"""
-                        <div style="font-family: Arial, sans-serif; width: 800px; margin: 0 auto; padding: 20px; border: 2px solid #7E3F8F;">
-                            <div style="text-align: center; margin-bottom: 20px;">
-                                <h1 style="color: #7E3F8F;">Inaya Cloth</h1>
-                                <p style="font-size: 0.9em;">Ladies Specialist</p>
-                                <p style="font-size: 0.9em;">Thawe Road, Near SBI Bank, Rasul Market – 841428</p>
-                                <p style="font-size: 0.9em;">Mobile: 9936551234</p>
-                            </div>
-                            <hr style="border: 1px solid #7E3F8F;">
-                            <h2 style="text-align: center;">Goods Received Note (GRN)</h2>
-                            <table style="width: 100%; font-size: 0.9em;">
-                                <tr>
-                                    <td><strong>GRN ID:</strong> {grn.id}</td>
-                                    <td style="text-align: right;"><strong>Date:</strong> {grn.date.strftime('%Y-%m-%d')}</td>
-                                </tr>
-                            </table>
-                            <table border="1" style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
-                                <tr style="background-color: #f3e8ff;">
-                                    <th style="padding: 10px;">Item Name</th>
-                                    <th style="padding: 10px;">Quantity</th>
-                                    <th style="padding: 10px;">MRP</th>
-                                    <th style="padding: 10px;">Selling Price</th>
-                                    <th style="padding: 10px;">Total Selling Price</th>
-                                </tr>
-                                <tr>
-                                    <td style="padding: 10px;">{stock.name}</td>
-                                    <td style="padding: 10px;">{grn.quantity}</td>
-                                    <td style="padding: 10px;">Rs. {stock.mrp:.2f}</td>
-                                    <td style="padding: 10px;">Rs. {stock.selling_price:.2f}</td>
-                                    <td style="padding: 10px;">Rs. {total_price:.2f}</td>
-                                </tr>
-                            </table>
-                            <div style="text-align: center; margin-top: 20px;">
-                                <p style="font-size: 0.8em;">Thank you for choosing Inaya Cloth!</p>
-                            </div>
-                        </div>
-                    """
-                    if pdfkit_config:
-                        pdf_bytes = pdfkit.from_string(html, False, configuration=pdfkit_config)
-                        pdf_io = io.BytesIO(pdf_bytes)
-                        st.download_button(
-                            label="Download GRN Invoice",
-                            data=pdf_io,
-                            file_name=f"grn_{grn.id}.pdf",
-                            mime="application/pdf"
-                        )
+                    invoice = grn_invoice(grn, stock)
+                    if invoice_backend:
+                        queue_invoice("grn", grn.id, invoice)
                     else:
-                        st.error("Cannot generate PDF due to missing wkhtmltopdf configuration.")
+                        st.error("Cannot generate PDF: no invoice PDF backend is available.")
                 except Exception as e:
                     st.error(f"Error generating PDF: {str(e)}")
+            if grn_options:
+                show_invoice_job("grn", grn_options[selected_grn], "Download GRN Invoice")
 
     elif selected == "User Management":
         if st.session_state.user["role"] != "Admin":
@@ -564,11 +2145,12 @@ def main_app():
                             if existing_user:
                                 st.error(f"User with email {email} already exists.")
                             else:
-                                hashed_password = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+                                hashed_password = hash_password(password)
                                 user = User(name=name, email=email, password=hashed_password, role=role)
                                 session.add(user)
                                 try:
                                     session.commit()
+                                    invalidate_user_directory()
                                     st.success("User created successfully!")
                                 except Exception as e:
                                     session.rollback()
@@ -576,52 +2158,60 @@ def main_app():
 
             with tab2:
                 st.subheader("User Report")
-                users = session.query(User).all()
-                df = pd.DataFrame([(u.id, u.name, u.email, u.role, "Active" if u.is_active else "Inactive") 
-                                  for u in users], 
-                                 columns=["ID", "Name", "Email", "Role", "Status"])
-                st.dataframe(df, use_container_width=True)
+                df = paginated_report(
+                    "user_report",
+                    select(User.id, User.name, User.email, User.role, User.is_active),
+                    lambda page: pd.DataFrame({
+                        "ID": page["id"],
+                        "Name": page["name"],
+                        "Email": page["email"],
+                        "Role": page["role"],
+                        "Status": page["is_active"].map(lambda active: "Active" if active else "Inactive"),
+                    }),
+                    order_by=[User.id],
+                    name_columns=[User.name, User.email],
+                    status_filters={"Active": User.is_active == True, "Inactive": User.is_active == False},
+                )
 
                 st.subheader("Manage Users")
-                user_options = {f"{u.name} (ID: {u.id})": u.id for u in users}
+                user_options = {f"{name} (ID: {user_id})": int(user_id) for user_id, name in zip(df["ID"], df["Name"])}
                 selected_user = st.selectbox("Select User", options=list(user_options.keys()))
-                user = session.query(User).get(user_options[selected_user])
-                if user.is_active:
+                # The report page already holds each user's status, so no per-user query is needed
+                user_status = {int(user_id): status for user_id, status in zip(df["ID"], df["Status"])}
+                user_id = user_options[selected_user] if selected_user else None
+                if user_id is None:
+                    st.info("No users match the current filters.")
+                elif user_status[user_id] == "Active":
                     if st.button("Delete User"):
-                        user.is_active = False
                         try:
-                            session.commit()
+                            commit_with_retry(set_user_active, user_id, False)
+                            invalidate_user_directory()
                             st.success("User deleted successfully!")
                             st.rerun()
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Error deleting user: {str(e)}")
                 else:
                     if st.button("Activate User"):
-                        user.is_active = True
                         try:
-                            session.commit()
+                            commit_with_retry(set_user_active, user_id, True)
+                            invalidate_user_directory()
                             st.success("User activated successfully!")
                             st.rerun()
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Error activating user: {str(e)}")
 
     elif selected == "Sale Management":
         st.header("Sale Management")
-        tab1, tab2 = st.tabs(["Sell Item", "Return Item"])
+        tab1, tab2, tab3, tab4 = st.tabs(["Sell Item", "Return Item", "Invoice Export", "Sales Summary"])
 
         with tab1:
             st.subheader("Sell Item")
-            stocks = session.query(Stock).all()
-            stock_options = {f"{s.name} (ID: {s.id})": s.id for s in stocks}
+            catalogue = load_stock_catalogue()
+            customer = customer_picker("sell")
+            stock_id = stock_picker("sell")
             
             with st.form("sell_form"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    stock_id = st.selectbox("Select Item", options=list(stock_options.keys()))
-                with col2:
-                    quantity = st.number_input("Quantity", min_value=1, step=1)
+                quantity = st.number_input("Quantity", min_value=1, step=1)
                 
                 if st.form_submit_button("Add Item"):
                     if not stock_id or not quantity:
@@ -629,21 +2219,22 @@ def main_app():
                     elif quantity < 1:
                         st.error("Quantity must be at least 1.")
                     else:
-                        stock = session.query(Stock).get(stock_options[stock_id])
-                        if stock.quantity >= quantity:
-                            st.session_state.sale_items.append({"stock_id": stock_options[stock_id], "quantity": quantity})
-                            st.success(f"Added {quantity} of {stock.name} to sale.")
+                        stock = catalogue.loc[stock_id]
+                        if stock["quantity"] >= quantity:
+                            st.session_state.sale_items.append({"stock_id": stock_id, "quantity": quantity})
+                            st.success(f"Added {quantity} of {stock['name']} to sale.")
+                            if stock["reorder_level"] > 0 and stock["quantity"] - quantity <= stock["reorder_level"]:
+                                st.warning(f"{stock['name']} will be at or below its reorder level of {stock['reorder_level']} after this sale.")
                         else:
-                            st.error(f"Insufficient stock: only {stock.quantity} available for {stock.name}.")
+                            st.error(f"Insufficient stock: only {stock['quantity']} available for {stock['name']}.")
                 
                 st.write("Selected Items:")
                 for item in st.session_state.sale_items:
-                    stock = session.query(Stock).get(item["stock_id"])
-                    st.write(f"Item: {stock.name}, Quantity: {item['quantity']}")
+                    st.write(f"Item: {catalogue.at[item['stock_id'], 'name']}, Quantity: {item['quantity']}")
                 
-                customer_name = st.text_input("Customer Name")
-                customer_mobile = st.text_input("Customer Mobile")
-                customer_address = st.text_input("Customer Address")
+                customer_name = st.text_input("Customer Name", value=customer.name if customer else "")
+                customer_mobile = st.text_input("Customer Mobile", value=customer.mobile if customer else "")
+                customer_address = st.text_input("Customer Address", value=(customer.address or "") if customer else "")
                 
                 if st.form_submit_button("Complete Sale"):
                     if not st.session_state.sale_items:
@@ -651,121 +2242,45 @@ def main_app():
                     elif not customer_name or not customer_mobile or not customer_address:
                         st.error("Customer details are required.")
                     else:
-                        sale = Sale(customer_name=customer_name, customer_mobile=customer_mobile, customer_address=customer_address)
-                        session.add(sale)
-                        session.flush()
-                        for item in st.session_state.sale_items:
-                            stock = session.query(Stock).get(item["stock_id"])
-                            if stock.quantity < item["quantity"]:
-                                st.error(f"Insufficient stock for {stock.name}: only {stock.quantity} available.")
-                                session.rollback()
-                                break
-                            sale_item = SaleItem(
-                                sale_id=sale.id,
-                                stock_id=item["stock_id"],
-                                quantity=item["quantity"],
-                                total_price=item["quantity"] * stock.selling_price
-                            )
-                            stock.quantity -= item["quantity"]
-                            session.add(sale_item)
-                        else:
-                            try:
-                                session.commit()
-                                st.session_state.sale_items = []
-                                st.success("Sale completed successfully!")
-                                st.rerun()
-                            except Exception as e:
-                                session.rollback()
-                                st.error(f"Error completing sale: {str(e)}")
+                        try:
+                            commit_with_retry(complete_sale, st.session_state.sale_items,
+                                              customer_name, customer_mobile, customer_address)
+                            invalidate_stock_catalogue()
+                            st.session_state.sale_items = []
+                            st.success("Sale completed successfully!")
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
+                        except Exception as e:
+                            st.error(f"Error completing sale: {str(e)}")
         
-            sales = session.query(Sale).all()
-            if sales:
-                latest_sale = session.query(Sale).order_by(Sale.id.desc()).first()
-                sale_items = session.query(SaleItem).filter_by(sale_id=latest_sale.id).all()
+            latest_sale = session.query(Sale).order_by(Sale.id.desc()).first()
+            if latest_sale:
                 if st.button("Generate Sale Invoice"):
                     try:
-                        items_html = ""
-                        grand_total = 0
-                        for item in sale_items:
-                            stock = session.query(Stock).get(item.stock_id)
-                            total = item.total_price
-                            grand_total += total
-                            items_html += f"""
-                                <tr>
-                                    <td style="padding: 10px;">{stock.name}</td>
-                                    <td style="padding: 10px;">{item.quantity}</td>
-                                    <td style="padding: 10px;">Rs. {stock.mrp:.2f}</td>
-                                    <td style="padding: 10px;">Rs. {stock.selling_price:.2f}</td>
-                                    <td style="padding: 10px;">Rs. {total:.2f}</td>
-                                </tr>
-                            """
-                        customer_name = latest_sale.customer_name or "N/A"
-                        customer_mobile = latest_sale.customer_mobile or "N/A"
-                        customer_address = latest_sale.customer_address or "N/A"
-                        html = f"""
-                            <div style="font-family: Arial, sans-serif; width: 800px; margin: 0 auto; padding: 20px; border: 2px solid #7E3F8F;">
-                                <div style="text-align: center; margin-bottom: 20px;">
-                                    <h1 style="color: #7E3F8F;">Inaya Cloth</h1>
-                                <p style="font-size: 0.9em;">Ladies Specialist</p>
-                                    <p style="font-size: 0.9em;">Thawe Road, Near SBI Bank, Rasul Market – 841428</p>
-                                    <p style="font-size: 0.9em;">Mobile: 9936551234</p>
-                                </div>
-                                <hr style="border: 1px solid #7E3F8F;">
-                                <h2 style="text-align: center;">Sale Invoice</h2>
-                                <table style="width: 100%; font-size: 0.9em;">
-                                    <tr>
-                                        <td><strong>Sale ID:</strong> {latest_sale.id}</td>
-                                        <td style="text-align: right;"><strong>Date:</strong> {latest_sale.date.strftime('%Y-%m-%d')}</td>
-                                    </tr>
-                                    <tr>
-                                        <td><strong>Customer:</strong> {customer_name}</td>
-                                        <td style="text-align: right;"><strong>Mobile:</strong> {customer_mobile}</td>
-                                    </tr>
-                                    <tr>
-                                        <td colspan="2"><strong>Address:</strong> {customer_address}</td>
-                                    </tr>
-                                </table>
-                                <table border="1" style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
-                                    <tr style="background-color: #f3e8ff;">
-                                        <th style="padding: 10px;">Item Name</th>
-                                        <th style="padding: 10px;">Quantity</th>
-                                        <th style="padding: 10px;">MRP</th>
-                                        <th style="padding: 10px;">Selling Price</th>
-                                        <th style="padding: 10px;">Total</th>
-                                    </tr>
-                                    {items_html}
-                                    <tr style="background-color: #f3e8ff;">
-                                        <td colspan="4" style="padding: 10px; text-align: right;"><strong>Grand Total:</strong></td>
-                                        <td style="padding: 10px;">Rs. {grand_total:.2f}</td>
-                                    </tr>
-                                </table>
-                                <div style="text-align: center; margin-top: 20px;">
-                                    <p style="font-size: 0.8em;">Thank you for choosing Inaya Cloth!</p>
-                                </div>
-                            </div>
-                        """
-                        if pdfkit_config:
-                            pdf_bytes = pdfkit.from_string(html, False, configuration=pdfkit_config)
-                            pdf_io = io.BytesIO(pdf_bytes)
-                            st.download_button(
-                                label="Download Sale Invoice",
-                                data=pdf_io,
-                                file_name=f"sale_{latest_sale.id}.pdf",
-                                mime="application/pdf"
-                            )
+                        invoice = sale_invoice(latest_sale)
+                        if invoice_backend:
+                            queue_invoice("sale", latest_sale.id, invoice)
                         else:
-                            st.error("Cannot generate PDF due to missing wkhtmltopdf configuration.")
+                            st.error("Cannot generate PDF: no invoice PDF backend is available.")
                     except Exception as e:
                         st.error(f"Error generating PDF: {str(e)}")
+                show_invoice_job("sale", latest_sale.id, "Download Sale Invoice")
 
         with tab2:
             st.subheader("Return Item")
-            sales = session.query(Sale).all()
-            sale_options = {f"Sale {s.id} ({s.customer_name or 'No Name'})": s.id for s in sales}
+            sale_search = st.text_input("Find Sale", placeholder="Sale ID, customer mobile or name (latest sales if empty)",
+                                        key="return_sale_search")
+            sales = cached_sale_search(sale_search)
+            sale_options = {f"Sale {s.id} ({s.customer_name or 'No Name'}, {s.customer_mobile or 'N/A'}, "
+                            f"{s.date.strftime('%Y-%m-%d')})": s.id for s in sales}
+            if not sale_options:
+                st.info("No matching sales.")
             
             sale_id = st.selectbox("Select Sale", options=list(sale_options.keys()))
             if sale_id:
-                sale_items = session.query(SaleItem).filter_by(sale_id=sale_options[sale_id]).all()
+                sale_items = (session.query(SaleItem).options(joinedload(SaleItem.stock))
+                              .filter_by(sale_id=sale_options[sale_id]).all())
                 valid_sale_items = [si for si in sale_items if si.quantity > 0]
                 
                 if not valid_sale_items:
@@ -773,16 +2288,15 @@ def main_app():
                 else:
                     st.write("Items in Sale:")
                     for item in valid_sale_items:
-                        stock = session.query(Stock).get(item.stock_id)
-                        st.write(f"Item: {stock.name}, Quantity Available: {item.quantity}, Total: Rs. {item.total_price:.2f}")
+                        st.write(f"Item: {item.stock.name}, Quantity Available: {item.quantity}, Total: Rs. {item.total_price:.2f}")
                     
                     with st.form("add_return_form"):
                         col1, col2 = st.columns(2)
                         with col1:
-                            sale_item_options = [f"{session.query(Stock).get(si.stock_id).name} (ID: {si.id})" for si in valid_sale_items]
-                            sale_item_id = st.selectbox("Select Item to Return", options=sale_item_options)
+                            sale_item_options = {f"{si.stock.name} (ID: {si.id})": si for si in valid_sale_items}
+                            sale_item_id = st.selectbox("Select Item to Return", options=list(sale_item_options.keys()))
                         with col2:
-                            selected_sale_item = next(si for si in valid_sale_items if f"{session.query(Stock).get(si.stock_id).name} (ID: {si.id})" == sale_item_id)
+                            selected_sale_item = sale_item_options[sale_item_id]
                             max_quantity = selected_sale_item.quantity
                             quantity = st.number_input("Quantity to Return", min_value=1, max_value=max_quantity, step=1)
                         
@@ -802,9 +2316,9 @@ def main_app():
                                 st.success(f"Added {quantity} units to return.")
                     
                     st.write("Items to Return:")
+                    return_sale_items = load_sale_items(item["sale_item_id"] for item in st.session_state.return_items)
                     for item in st.session_state.return_items:
-                        sale_item = session.query(SaleItem).get(item["sale_item_id"])
-                        stock = session.query(Stock).get(sale_item.stock_id)
+                        stock = return_sale_items[item["sale_item_id"]].stock
                         st.write(f"Item: {stock.name}, Quantity: {item['quantity']}, Reason: {item['reason']}")
                     
                     with st.form("complete_return_form"):
@@ -812,95 +2326,121 @@ def main_app():
                             if not st.session_state.return_items:
                                 st.error("No items added to return.")
                             else:
-                                for item in st.session_state.return_items:
-                                    sale_item = session.query(SaleItem).get(item["sale_item_id"])
-                                    if item["quantity"] > sale_item.quantity:
-                                        st.error(f"Cannot return {item['quantity']} units of item ID {sale_item.id}. Only {sale_item.quantity} available.")
-                                        session.rollback()
-                                        break
-                                    if sale_item.quantity - item["quantity"] < 0:
-                                        st.error(f"Return would result in negative quantity for item ID {sale_item.id}.")
-                                        session.rollback()
-                                        break
-                                    return_entry = Return(
-                                        sale_item_id=item["sale_item_id"],
-                                        quantity=item["quantity"],
-                                        reason=item["reason"]
-                                    )
-                                    stock = session.query(Stock).get(sale_item.stock_id)
-                                    stock.quantity += item["quantity"]
-                                    sale_item.quantity -= item["quantity"]
-                                    sale_item.total_price = sale_item.quantity * stock.selling_price
-                                    session.add(return_entry)
-                                else:
-                                    try:
-                                        session.commit()
-                                        st.session_state.return_items = []
-                                        st.success("Return processed successfully!")
-                                        st.rerun()
-                                    except Exception as e:
-                                        session.rollback()
-                                        st.error(f"Error processing return: {str(e)}")
+                                try:
+                                    returned_sale_ids = commit_with_retry(complete_return, st.session_state.return_items)
+                                    invalidate_stock_catalogue()
+                                    for returned_sale_id in returned_sale_ids:
+                                        invalidate_invoice_cache("sale", returned_sale_id)
+                                    st.session_state.return_items = []
+                                    st.success("Return processed successfully!")
+                                    st.rerun()
+                                except ValueError as e:
+                                    st.error(str(e))
+                                except Exception as e:
+                                    st.error(f"Error processing return: {str(e)}")
             
-            returns = session.query(Return).all()
-            if returns:
-                latest_return = session.query(Return).order_by(Return.id.desc()).first()
-                sale_item = session.query(SaleItem).get(latest_return.sale_item_id)
-                stock = session.query(Stock).get(sale_item.stock_id)
-                total_amount = latest_return.quantity * stock.selling_price
+            latest_return = session.query(Return).order_by(Return.id.desc()).first()
+            if latest_return:
                 if st.button("Generate Return Invoice"):
                     try:
-                        html = f"""
-                            <div style="font-family: Arial, sans-serif; width: 800px; margin: 0 auto; padding: 20px; border: 2px solid #7E3F8F;">
-                                <div style="text-align: center; margin-bottom: 20px;">
-                                    <h1 style="color: #7E3F8F;">Inaya Cloth</h1>
-                                    <p style="font-size: 0.9em;">Ladies Specialist</p>
-                                    <p style="font-size: 0.9em;">Thawe Road, Near SBI Bank, Rasul Market – 841428</p>
-                                    <p style="font-size: 0.9em;">Mobile: 9936551234</p>
-                                </div>
-                                <hr style="border: 1px solid #7E3F8F;">
-                                <h2 style="text-align: center;">Return Invoice</h2>
-                                <table style="width: 100%; font-size: 0.9em;">
-                                    <tr>
-                                        <td><strong>Return ID:</strong> {latest_return.id}</td>
-                                        <td style="text-align: right;"><strong>Date:</strong> {latest_return.date.strftime('%Y-%m-%d')}</td>
-                                    </tr>
-                                    <tr>
-                                        <td colspan="2"><strong>Reason:</strong> {latest_return.reason}</td>
-                                    </tr>
-                                </table>
-                                <table border="1" style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
-                                    <tr style="background-color: #f3e8ff;">
-                                        <th style="padding: 10px;">Item Name</th>
-                                        <th style="padding: 10px;">Quantity</th>
-                                        <th style="padding: 10px;">Selling Price</th>
-                                        <th style="padding: 10px;">Total Amount</th>
-                                    </tr>
-                                    <tr>
-                                        <td style="padding: 10px;">{stock.name}</td>
-                                        <td style="padding: 10px;">{latest_return.quantity}</td>
-                                        <td style="padding: 10px;">Rs. {stock.selling_price:.2f}</td>
-                                        <td style="padding: 10px;">Rs. {total_amount:.2f}</td>
-                                    </tr>
-                                </table>
-                                <div style="text-align: center; margin-top: 20px;">
-                                    <p style="font-size: 0.8em;">Thank you for choosing Inaya Cloth!</p>
-                                </div>
-                            </div>
-                        """
-                        if pdfkit_config:
-                            pdf_bytes = pdfkit.from_string(html, False, configuration=pdfkit_config)
-                            pdf_io = io.BytesIO(pdf_bytes)
-                            st.download_button(
-                                label="Download Return Invoice",
-                                data=pdf_io,
-                                file_name=f"return_{latest_return.id}.pdf",
-                                mime="application/pdf"
-                            )
+                        invoice = return_invoice(latest_return, latest_return.sale_item.stock)
+                        if invoice_backend:
+                            queue_invoice("return", latest_return.id, invoice)
                         else:
-                            st.error("Cannot generate PDF due to missing wkhtmltopdf configuration.")
+                            st.error("Cannot generate PDF: no invoice PDF backend is available.")
                     except Exception as e:
                         st.error(f"Error generating PDF: {str(e)}")
+                show_invoice_job("return", latest_return.id, "Download Return Invoice")
+
+        with tab3:
+            st.subheader("Batch Invoice Export")
+            col1, col2 = st.columns(2)
+            with col1:
+                export_start = st.date_input("From", value=datetime.utcnow().date().replace(day=1), key="export_start")
+            with col2:
+                export_end = st.date_input("To", value=datetime.utcnow().date(), key="export_end")
+            export_format = st.radio("Format", ["ZIP of invoice PDFs", "One merged PDF"], horizontal=True,
+                                     help=f"A merged PDF holds at most {MERGED_EXPORT_LIMIT} invoices.")
+            if st.button("Export Invoices"):
+                if not invoice_backend:
+                    st.error("Cannot generate PDF: no invoice PDF backend is available.")
+                elif export_start > export_end:
+                    st.error("'From' date must not be after 'To' date.")
+                else:
+                    progress = st.progress(0.0)
+                    merged = export_format == "One merged PDF"
+                    try:
+                        export_path, exported = export_sale_invoices(
+                            export_start, export_end, merged=merged,
+                            on_progress=lambda done, total: progress.progress(done / total, text=f"Prepared {done} of {total} invoices"),
+                        )
+                        if not exported:
+                            st.warning("No sales in the selected date range.")
+                        else:
+                            try:
+                                with open(export_path, "rb") as export_file:
+                                    st.download_button(
+                                        label=f"Download {exported} Invoices",
+                                        data=export_file,
+                                        file_name=f"sale_invoices_{export_start}_{export_end}.{'pdf' if merged else 'zip'}",
+                                        mime="application/pdf" if merged else "application/zip",
+                                    )
+                            finally:
+                                os.remove(export_path)
+                    except ValueError as e:
+                        st.error(str(e))
+                    except Exception as e:
+                        st.error(f"Error exporting invoices: {str(e)}")
+
+        with tab4:
+            st.subheader("Sales Summary")
+            if st.session_state.user["role"] == "Admin":
+                if st.button("Rebuild Sales Summary"):
+                    try:
+                        mismatches = commit_with_retry(rebuild_sales_summary, session)
+                        if mismatches["days"] or mismatches["items"]:
+                            st.warning(f"Sales summary rebuilt: corrected {mismatches['days']} day rows and "
+                                       f"{mismatches['items']} item rows that did not match the recorded sales.")
+                        else:
+                            st.success("Sales summary rebuilt: it matched the recorded sales.")
+                    except Exception as e:
+                        st.error(f"Error rebuilding sales summary: {str(e)}")
+
+            # Reads at most a month of pre-aggregated rows instead of the sale history
+            today = datetime.utcnow().date()
+            periods = {"Today": today, "This Week": today - timedelta(days=today.weekday()), "This Month": today.replace(day=1)}
+            summary = pd.read_sql(
+                select(DailySalesSummary.day, DailySalesSummary.sales_count, DailySalesSummary.items_sold,
+                       DailySalesSummary.items_returned, DailySalesSummary.revenue)
+                .where(DailySalesSummary.day >= min(periods.values())),
+                session.connection(),
+            )
+            for column, (label, start) in zip(st.columns(len(periods)), periods.items()):
+                rows = summary[summary["day"] >= start]
+                with column:
+                    st.metric(f"{label} Revenue", f"Rs. {rows['revenue'].sum():.2f}")
+                    st.caption(f"{int(rows['sales_count'].sum())} sales, {int(rows['items_sold'].sum())} items sold, "
+                               f"{int(rows['items_returned'].sum())} returned")
+
+            top_items = pd.read_sql(
+                select(Stock.name, func.sum(DailyItemSales.items_sold).label("items_sold"),
+                       func.sum(DailyItemSales.revenue).label("revenue"))
+                .join(Stock, DailyItemSales.stock_id == Stock.id)
+                .where(DailyItemSales.day >= periods["This Month"])
+                .group_by(DailyItemSales.stock_id, Stock.name)
+                .order_by(func.sum(DailyItemSales.revenue).desc())
+                .limit(10),
+                session.connection(),
+            )
+            if top_items.empty:
+                st.info("No sales this month.")
+            else:
+                st.write("Top Items This Month:")
+                st.dataframe(pd.DataFrame({
+                    "Item": top_items["name"],
+                    "Items Sold": top_items["items_sold"],
+                    "Revenue": top_items["revenue"].map(lambda value: f"Rs. {value:.2f}"),
+                }), use_container_width=True)
 
     elif selected == "Delivery Management":
         st.header("Delivery Management")
@@ -908,15 +2448,11 @@ def main_app():
 
         with tab1:
             st.subheader("Pickup Item")
-            stocks = session.query(Stock).all()
-            stock_options = {f"{s.name} (ID: {s.id})": s.id for s in stocks}
+            catalogue = load_stock_catalogue()
+            stock_id = stock_picker("pickup")
             
             with st.form("add_delivery_item_form"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    stock_id = st.selectbox("Select Item", options=list(stock_options.keys()))
-                with col2:
-                    quantity = st.number_input("Quantity", min_value=1, step=1)
+                quantity = st.number_input("Quantity", min_value=1, step=1)
                 
                 if st.form_submit_button("Add Item"):
                     if not stock_id or not quantity:
@@ -924,31 +2460,29 @@ def main_app():
                     elif quantity < 1:
                         st.error("Quantity must be at least 1.")
                     else:
-                        stock = session.query(Stock).get(stock_options[stock_id])
-                        if stock.quantity >= quantity:
+                        stock = catalogue.loc[stock_id]
+                        if stock["quantity"] >= quantity:
                             st.session_state.pickup_items.append({
-                                "stock_id": stock_options[stock_id],
+                                "stock_id": stock_id,
                                 "quantity": quantity
                             })
-                            st.success(f"Added {quantity} of {stock.name} for delivery.")
+                            st.success(f"Added {quantity} of {stock['name']} for delivery.")
                         else:
-                            st.error(f"Insufficient stock: only {stock.quantity} available for {stock.name}.")
+                            st.error(f"Insufficient stock: only {stock['quantity']} available for {stock['name']}.")
             
             if st.session_state.pickup_items:
                 st.write("Items to Pickup:")
-                pickup_items_df = pd.DataFrame([
-                    {
-                        "Item": session.query(Stock).get(item["stock_id"]).name,
-                        "Quantity": item["quantity"]
-                    }
-                    for item in st.session_state.pickup_items
-                ])
+                pickup_items_df = pd.DataFrame({
+                    "Item": catalogue.loc[[item["stock_id"] for item in st.session_state.pickup_items], "name"].tolist(),
+                    "Quantity": [item["quantity"] for item in st.session_state.pickup_items],
+                })
                 st.dataframe(pickup_items_df, use_container_width=True)
             
+            customer = customer_picker("pickup")
             with st.form("complete_pickup_form"):
-                customer_name = st.text_input("Customer Name")
-                customer_mobile = st.text_input("Customer Mobile")
-                customer_address = st.text_area("Delivery Address")
+                customer_name = st.text_input("Customer Name", value=customer.name if customer else "")
+                customer_mobile = st.text_input("Customer Mobile", value=customer.mobile if customer else "")
+                customer_address = st.text_area("Delivery Address", value=(customer.address or "") if customer else "")
                 
                 if st.form_submit_button("Complete Pickup"):
                     if not st.session_state.pickup_items:
@@ -957,74 +2491,47 @@ def main_app():
                         st.error("Customer details are required.")
                     else:
                         try:
-                            # Create Sale
-                            sale = Sale(
-                                customer_name=customer_name,
-                                customer_mobile=customer_mobile,
-                                customer_address=customer_address
-                            )
-                            session.add(sale)
-                            session.flush()
-                            # Create Delivery
-                            delivery = Delivery(
-                                sale_id=sale.id,
-                                status="Picked",
-                                customer_name=customer_name,
-                                customer_mobile=customer_mobile,
-                                customer_address=customer_address
-                            )
-                            session.add(delivery)
-                            session.flush()
-                            # Process items
-                            for item in st.session_state.pickup_items:
-                                stock = session.query(Stock).get(item["stock_id"])
-                                if stock.quantity < item["quantity"]:
-                                    st.error(f"Insufficient stock for {stock.name}: only {stock.quantity} available.")
-                                    session.rollback()
-                                    break
-                                # Create SaleItem
-                                sale_item = SaleItem(
-                                    sale_id=sale.id,
-                                    stock_id=item["stock_id"],
-                                    quantity=item["quantity"],
-                                    total_price=item["quantity"] * stock.selling_price
-                                )
-                                stock.quantity -= item["quantity"]
-                                session.add(sale_item)
-                                session.flush()
-                                # Create DeliveryItem
-                                delivery_item = DeliveryItem(
-                                    delivery_id=delivery.id,
-                                    sale_item_id=sale_item.id,
-                                    quantity=item["quantity"]
-                                )
-                                session.add(delivery_item)
-                            else:
-                                session.commit()
-                                st.session_state.pickup_items = []
-                                st.success("Delivery pickup completed successfully!")
-                                st.rerun()
+                            commit_with_retry(complete_pickup, st.session_state.pickup_items,
+                                              customer_name, customer_mobile, customer_address)
+                            invalidate_stock_catalogue()
+                            st.session_state.pickup_items = []
+                            st.success("Delivery pickup completed successfully!")
+                            st.rerun()
+                        except ValueError as e:
+                            st.error(str(e))
                         except Exception as e:
-                            session.rollback()
                             st.error(f"Error completing pickup: {str(e)}")
 
         with tab2:
             st.subheader("Delivery Report")
-            deliveries = session.query(Delivery).all()
-            delivery_data = [(d.id, d.sale_id, d.status, d.customer_name or "N/A", d.customer_mobile or "N/A", 
-                             d.customer_address or "N/A", d.reason or "N/A") for d in deliveries]
-            df_delivery = pd.DataFrame(delivery_data, 
-                                      columns=["ID", "Sale ID", "Status", "Customer Name", "Mobile", "Address", "Reason"])
-            st.dataframe(df_delivery, use_container_width=True)
-
-            if deliveries:
-                delivery_options = {f"Delivery {d.id} (Sale ID {d.sale_id})": d.id for d in deliveries}
+            df_delivery = paginated_report(
+                "delivery_report",
+                select(Delivery.id, Delivery.sale_id, Delivery.status, Delivery.customer_name,
+                       Delivery.customer_mobile, Delivery.customer_address, Delivery.reason),
+                lambda page: pd.DataFrame({
+                    "ID": page["id"],
+                    "Sale ID": page["sale_id"],
+                    "Status": page["status"],
+                    "Customer Name": page["customer_name"].fillna("N/A"),
+                    "Mobile": page["customer_mobile"].fillna("N/A"),
+                    "Address": page["customer_address"].fillna("N/A"),
+                    "Reason": page["reason"].fillna("N/A"),
+                }),
+                order_by=[Delivery.id.desc()],
+                date_column=Delivery.date,
+                name_columns=[Delivery.customer_name, Delivery.customer_mobile],
+                status_filters={status: Delivery.status == status for status in ["Picked", "Delivered", "Cancelled"]},
+            )
+
+            if not df_delivery.empty:
+                delivery_options = {f"Delivery {delivery_id} (Sale ID {sale_id})": int(delivery_id)
+                                    for delivery_id, sale_id in zip(df_delivery["ID"], df_delivery["Sale ID"])}
                 selected_delivery = st.selectbox("Select Delivery", options=list(delivery_options.keys()))
                 delivery = session.query(Delivery).get(delivery_options[selected_delivery])
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    if delivery.status != "Delivered":
+                    if delivery.status == "Picked":
                         if st.button("Mark as Delivered"):
                             delivery.status = "Delivered"
                             try:
@@ -1039,80 +2546,14 @@ def main_app():
                         if st.button("Generate Sale Invoice"):
                             try:
                                 sale = session.query(Sale).get(delivery.sale_id)
-                                sale_items = session.query(SaleItem).filter_by(sale_id=sale.id).all()
-                                items_html = ""
-                                grand_total = 0
-                                for item in sale_items:
-                                    stock = session.query(Stock).get(item.stock_id)
-                                    total = item.total_price
-                                    grand_total += total
-                                    items_html += f"""
-                                        <tr>
-                                            <td style="padding: 10px;">{stock.name}</td>
-                                            <td style="padding: 10px;">{item.quantity}</td>
-                                            <td style="padding: 10px;">Rs. {stock.mrp:.2f}</td>
-                                            <td style="padding: 10px;">Rs. {stock.selling_price:.2f}</td>
-                                            <td style="padding: 10px;">Rs. {total:.2f}</td>
-                                        </tr>
-                                    """
-                                customer_name = sale.customer_name or "N/A"
-                                customer_mobile = sale.customer_mobile or "N/A"
-                                customer_address = sale.customer_address or "N/A"
-                                html = f"""
-                                    <div style="font-family: Arial, sans-serif; width: 800px; margin: 0 auto; padding: 20px; border: 2px solid #7E3F8F;">
-                                        <div style="text-align: center; margin-bottom: 20px;">
-                                            <h1 style="color: #7E3F8F;">Inaya Cloth</h1>
-                                            <p style="font-size: 0.9em;">Ladies Specialist</p>
-                                            <p style="font-size: 0.9em;">Thawe Road, Near SBI Bank, Rasul Market – 841428</p>
-                                            <p style="font-size: 0.9em;">Mobile: 9936551234</p>
-                                        </div>
-                                        <hr style="border: 1px solid #7E3F8F;">
-                                        <h2 style="text-align: center;">Sale Invoice</h2>
-                                        <table style="width: 100%; font-size: 0.9em;">
-                                            <tr>
-                                                <td><strong>Sale ID:</strong> {sale.id}</td>
-                                                <td style="text-align: right;"><strong>Date:</strong> {sale.date.strftime('%Y-%m-%d')}</td>
-                                            </tr>
-                                            <tr>
-                                                <td><strong>Customer:</strong> {customer_name}</td>
-                                                <td style="text-align: right;"><strong>Mobile:</strong> {customer_mobile}</td>
-                                            </tr>
-                                            <tr>
-                                                <td colspan="2"><strong>Address:</strong> {customer_address}</td>
-                                            </tr>
-                                        </table>
-                                        <table border="1" style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
-                                            <tr style="background-color: #f3e8ff;">
-                                                <th style="padding: 10px;">Item Name</th>
-                                                <th style="padding: 10px;">Quantity</th>
-                                                <th style="padding: 10px;">MRP</th>
-                                                <th style="padding: 10px;">Selling Price</th>
-                                                <th style="padding: 10px;">Total</th>
-                                            </tr>
-                                            {items_html}
-                                            <tr style="background-color: #f3e8ff;">
-                                                <td colspan="4" style="padding: 10px; text-align: right;"><strong>Grand Total:</strong></td>
-                                                <td style="padding: 10px;">Rs. {grand_total:.2f}</td>
-                                            </tr>
-                                        </table>
-                                        <div style="text-align: center; margin-top: 20px;">
-                                            <p style="font-size: 0.8em;">Thank you for choosing Inaya Cloth!</p>
-                                        </div>
-                                    </div>
-                                """
-                                if pdfkit_config:
-                                    pdf_bytes = pdfkit.from_string(html, False, configuration=pdfkit_config)
-                                    pdf_io = io.BytesIO(pdf_bytes)
-                                    st.download_button(
-                                        label="Download Sale Invoice",
-                                        data=pdf_io,
-                                        file_name=f"sale_{sale.id}.pdf",
-                                        mime="application/pdf"
-                                    )
+                                invoice = sale_invoice(sale)
+                                if invoice_backend:
+                                    queue_invoice("sale", sale.id, invoice)
                                 else:
-                                    st.error("Cannot generate PDF due to missing wkhtmltopdf configuration.")
+                                    st.error("Cannot generate PDF: no invoice PDF backend is available.")
                             except Exception as e:
                                 st.error(f"Error generating PDF: {str(e)}")
+                        show_invoice_job("sale", delivery.sale_id, "Download Sale Invoice")
                 with col2:
                     with st.form("return_delivery_form"):
                         reason = st.text_input("Reason for Return")
@@ -1120,110 +2561,99 @@ def main_app():
                             if not reason:
                                 st.error("Reason for return is required.")
                             else:
-                                delivery.status = "Cancelled"
-                                delivery.reason = reason
-                                # Update stock quantities
-                                delivery_items = session.query(DeliveryItem).filter_by(delivery_id=delivery.id).all()
-                                for item in delivery_items:
-                                    sale_item = session.query(SaleItem).get(item.sale_item_id)
-                                    stock = session.query(Stock).get(sale_item.stock_id)
-                                    stock.quantity += item.quantity
-                                if "recent_delivered" in st.session_state:
-                                    del st.session_state.recent_delivered
                                 try:
-                                    session.commit()
+                                    sale_id = commit_with_retry(cancel_delivery, delivery.id, reason)
+                                    if "recent_delivered" in st.session_state:
+                                        del st.session_state.recent_delivered
+                                    invalidate_stock_catalogue()
+                                    invalidate_invoice_cache("delivery", delivery.id)
+                                    invalidate_invoice_cache("sale", sale_id)
                                     st.success("Delivery cancelled successfully and stock updated!")
                                     st.rerun()
+                                except ValueError as e:
+                                    st.error(str(e))
                                 except Exception as e:
-                                    session.rollback()
                                     st.error(f"Error returning delivery: {str(e)}")
             else:
                 st.warning("No deliveries available.")
             
             if st.button("Generate Delivery Invoice"):
                 try:
-                    delivery_items = session.query(DeliveryItem).filter_by(delivery_id=delivery.id).all()
-                    items_html = ""
-                    grand_total = 0
-                    for item in delivery_items:
-                        sale_item = session.query(SaleItem).get(item.sale_item_id)
-                        stock = session.query(Stock).get(sale_item.stock_id)
-                        total = item.quantity * stock.selling_price
-                        grand_total += total
-                        items_html += f"""
-                            <tr>
-                                <td style="padding: 10px;">{stock.name}</td>
-                                <td style="padding: 10px;">{item.quantity}</td>
-                                <td style="padding: 10px;">Rs. {stock.mrp:.2f}</td>
-                                <td style="padding: 10px;">Rs. {stock.selling_price:.2f}</td>
-                                <td style="padding: 10px;">Rs. {total:.2f}</td>
-                            </tr>
-                        """
-                    customer_name = delivery.customer_name or "N/A"
-                    customer_mobile = delivery.customer_mobile or "N/A"
-                    customer_address = delivery.customer_address or "N/A"
-                    html = f"""
-                        <div style="font-family: Arial, sans-serif; width: 800px; margin: 0 auto; padding: 20px; border: 2px solid #7E3F8F;">
-                            <div style="text-align: center; margin-bottom: 20px;">
-                                <h1 style="color: #7E3F8F;">Inaya Cloth</h1>
-                                <p style="font-size: 0.9em;">Ladies Specialist</p>
-                                <p style="font-size: 0.9em;">Thawe Road, Near SBI Bank, Rasul Market – 841428</p>
-                                <p style="font-size: 0.9em;">Mobile: 9936551234</p>
-                            </div>
-                            <hr style="border: 1px solid #7E3F8F;">
-                            <h2 style="text-align: center;">Delivery Invoice</h2>
-                            <table style="width: 100%; font-size: 0.9em;">
-                                <tr>
-                                    <td><strong>Delivery ID:</strong> {delivery.id}</td>
-                                    <td style="text-align: right;"><strong>Date:</strong> {delivery.date.strftime('%Y-%m-%d')}</td>
-                                </tr>
-                                <tr>
-                                    <td><strong>Customer:</strong> {customer_name}</td>
-                                    <td style="text-align: right;"><strong>Mobile:</strong> {customer_mobile}</td>
-                                </tr>
-                                <tr>
-                                    <td colspan="2"><strong>Address:</strong> {customer_address}</td>
-                                </tr>
-                                <tr>
-                                    <td><strong>Status:</strong> {delivery.status}</td>
-                                    <td style="text-align: right;"><strong>Sale ID:</strong> {delivery.sale_id}</td>
-                                </tr>
-                            </table>
-                            <table border="1" style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
-                                <tr style="background-color: #f3e8ff;">
-                                    <th style="padding: 10px;">Item Name</th>
-                                    <th style="padding: 10px;">Quantity</th>
-                                    <th style="padding: 10px;">MRP</th>
-                                    <th style="padding: 10px;">Selling Price</th>
-                                    <th style="padding: 10px;">Total</th>
-                                </tr>
-                                {items_html}
-                                <tr style="background-color: #f3e8ff;">
-                                    <td colspan="4" style="padding: 10px; text-align: right;"><strong>Grand Total:</strong></td>
-                                    <td style="padding: 10px;">Rs. {grand_total:.2f}</td>
-                                </tr>
-                            </table>
-                            <div style="text-align: center; margin-top: 20px;">
-                                <p style="font-size: 0.8em;">Thank you for choosing Inaya Cloth!</p>
-                            </div>
-                        </div>
-                    """
-                    if pdfkit_config:
-                        pdf_bytes = pdfkit.from_string(html, False, configuration=pdfkit_config)
-                        pdf_io = io.BytesIO(pdf_bytes)
-                        st.download_button(
-                            label="Download Delivery Invoice",
-                            data=pdf_io,
-                            file_name=f"delivery_{delivery.id}.pdf",
-                            mime="application/pdf"
-                        )
+                    delivery_items = (session.query(DeliveryItem)
+                                      .options(joinedload(DeliveryItem.sale_item).joinedload(SaleItem.stock))
+                                      .filter_by(delivery_id=delivery.id).all())
+                    invoice = delivery_invoice(delivery, delivery_items)
+                    if invoice_backend:
+                        queue_invoice("delivery", delivery.id, invoice)
                     else:
-                        st.error("Cannot generate PDF due to missing wkhtmltopdf configuration.")
+                        st.error("Cannot generate PDF: no invoice PDF backend is available.")
                 except Exception as e:
                     st.error(f"Error generating PDF: {str(e)}")
+            if not df_delivery.empty:
+                show_invoice_job("delivery", delivery.id, "Download Delivery Invoice")
+
+    elif selected == "Sales Analytics":
+        st.header("Sales Analytics")
+        if st.session_state.user["role"] != "Admin":
+            st.error("Access denied: Only Admins can access Sales Analytics.")
+        else:
+            today = datetime.utcnow().date()
+            col1, col2 = st.columns(2)
+            with col1:
+                analytics_start = st.date_input("From", value=today - timedelta(days=29), key="analytics_start")
+            with col2:
+                analytics_end = st.date_input("To", value=today, key="analytics_end")
+            if analytics_start > analytics_end:
+                st.error("'From' date must not be after 'To' date.")
+            else:
+                daily = revenue_by_day(analytics_start, analytics_end)
+                items = item_sales_analytics(analytics_start, analytics_end)
+                if daily.empty:
+                    st.info("No sales in the selected date range.")
+                else:
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Revenue", f"Rs. {daily['revenue'].sum():.2f}")
+                    col2.metric("Sales", int(daily["sales_count"].sum()))
+                    units = items["items_sold"].sum() + items["items_returned"].sum()
+                    col3.metric("Return Rate", f"{(items['items_returned'].sum() / units * 100) if units else 0:.1f}%")
+                    col4.metric("Discount Given", f"Rs. {items['discount'].sum():.2f}")
+
+                    st.subheader("Revenue by Day")
+                    st.bar_chart(daily.set_index("day")["revenue"])
+
+                    st.subheader("Top-Selling Items")
+                    top_items = items.nlargest(10, "items_sold")
+                    st.bar_chart(top_items.set_index("name")["items_sold"])
+
+                    st.subheader("Return Rate per Item")
+                    returned = items[items["items_returned"] > 0].sort_values("return_rate", ascending=False).head(20)
+                    st.dataframe(pd.DataFrame({
+                        "Item": returned["name"],
+                        "Sold": returned["items_sold"] + returned["items_returned"],
+                        "Returned": returned["items_returned"],
+                        "Return Rate": returned["return_rate"].map(lambda rate: f"{rate:.1f}%"),
+                    }), use_container_width=True)
+
+                    st.subheader("Discount Given (MRP vs Selling Price)")
+                    discounted = items[items["discount"] > 0.005].nlargest(20, "discount")
+                    st.dataframe(pd.DataFrame({
+                        "Item": discounted["name"],
+                        "Items Sold": discounted["items_sold"],
+                        "Revenue": discounted["revenue"].map(lambda value: f"Rs. {value:.2f}"),
+                        "Discount": discounted["discount"].map(lambda value: f"Rs. {value:.2f}"),
+                        "Discount %": (discounted["discount"] / (discounted["revenue"] + discounted["discount"]) * 100)
+                                      .map(lambda rate: f"{rate:.1f}%"),
+                    }), use_container_width=True)
 
 # Run the app
-if st.session_state.user is None:
-    login_page()
-else:
-    main_app()
\ No newline at end of file
+try:
+    if st.session_state.user is not None and not revalidate_session_user():
+        clear_user_session()
+        st.warning("Your account is no longer active. Please contact an Admin.")
+    if st.session_state.user is None:
+        login_page()
+    else:
+        main_app()
+finally:
+    # Always release this run's session so its identity map never outlives the rerun
+    Session.remove()
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Query-plan check: prints SQLite's EXPLAIN QUERY PLAN for every lookup in hot_lookup_queries() and
+# exits with status 1 if any plan reports a full table SCAN or a declared index is missing.
+#
+#   python bench/check_query_plans.py [database]
+#
+# Without an argument the check runs on a freshly created database. Given a database file, it runs
+# on a migrated copy of it, so the file itself is left untouched.
+import os
+import shutil
+import sys
+import tempfile
+
+from common import load_app
+
+def main(database_path=None):
+    if database_path:
+        copy_path = os.path.join(tempfile.mkdtemp(prefix="inaya_plans_"), os.path.basename(database_path))
+        shutil.copy(database_path, copy_path)
+        database_path = copy_path
+    app = load_app(database_path)
+    failures = [f"missing index {index_name}" for index_name in app.find_missing_indexes()]
+    for label, plan in app.explain_hot_lookups().items():
+        scan = any(detail.startswith("SCAN") for detail in plan)
+        print(f"{'SCAN' if scan else 'ok  '}  {label}: {'; '.join(plan)}")
+        if scan:
+            failures.append(f"full table scan in {label}")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    print(f"{len(failures)} problem(s) found.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2]))
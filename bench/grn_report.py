@@ -0,0 +1,70 @@
+# GRN report benchmark: seeds GRN rows in steps (default 1,000 / 10,000 / 100,000) and times the
+# Inventory Management page, which renders the paginated GRN report, at each size. The report
+# reads one joined page at a time, so render time should stay roughly flat as rows grow.
+#
+#   python bench/grn_report.py [row counts...]
+#
+# Exits with status 1 if the largest size renders more than MAX_SLOWDOWN times slower than the
+# smallest.
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from common import best_of, run_page, use_scratch_database
+
+STOCK_ITEMS = 500
+MAX_SLOWDOWN = 2.0
+REPORT_PAGE_SIZE = int(os.environ.get("INAYA_REPORT_PAGE_SIZE", "50"))  # as in app.py
+
+# Seeded with sqlite3 once the first page run has migrated the database. Importing app.py in this
+# process as well would leave its login form open around the AppTest runs.
+def seed_stock(conn):
+    conn.executemany(
+        "INSERT INTO stock (name, sku, quantity, selling_price, mrp, reorder_level) VALUES (?, ?, 1000, ?, ?, 0)",
+        [(f"Bench Item {i}", f"BENCH-{i:05d}", 500.0 + i, 600.0 + i) for i in range(STOCK_ITEMS)],
+    )
+    conn.commit()
+    return [row[0] for row in conn.execute("SELECT id FROM stock")]
+
+def seed_grns(conn, stock_ids, count):
+    start = datetime.utcnow() - timedelta(days=365)
+    conn.executemany(
+        "INSERT INTO grn (stock_id, quantity, date) VALUES (?, ?, ?)",
+        [(random.choice(stock_ids), random.randint(1, 50),
+          (start + timedelta(minutes=random.randint(0, 365 * 24 * 60))).isoformat(" "))
+         for _ in range(count)],
+    )
+    conn.commit()
+
+# The SQL behind the GRN Report: total row count and the newest page
+def grn_report_query(conn, page_size):
+    conn.execute("SELECT count(*) FROM grn JOIN stock ON grn.stock_id = stock.id").fetchone()
+    conn.execute(
+        "SELECT grn.id, stock.name, grn.quantity, stock.mrp, stock.selling_price, grn.date "
+        "FROM grn JOIN stock ON grn.stock_id = stock.id ORDER BY grn.id DESC LIMIT ?", (page_size,)
+    ).fetchall()
+
+def main(sizes):
+    random.seed(1)
+    database_path = use_scratch_database()
+    run_page("Inventory Management")  # creates the schema; also warms imports and caches
+    conn = sqlite3.connect(database_path)
+    stock_ids = seed_stock(conn)
+    results = []
+    seeded = 0
+    print(f"{'GRN rows':>10} {'query ms':>10} {'page ms':>10}")
+    for size in sizes:
+        seed_grns(conn, stock_ids, size - seeded)
+        seeded = size
+        query_time, _ = best_of(5, grn_report_query, conn, REPORT_PAGE_SIZE)
+        page_time, _ = best_of(3, run_page, "Inventory Management")
+        results.append(page_time)
+        print(f"{size:>10,} {query_time * 1000:>10.1f} {page_time * 1000:>10.1f}")
+    slowdown = results[-1] / results[0]
+    print(f"Largest/smallest page render: {slowdown:.2f}x (limit {MAX_SLOWDOWN}x)")
+    return 0 if slowdown <= MAX_SLOWDOWN else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sorted(int(arg) for arg in sys.argv[1:]) or [1000, 10000, 100000]))
@@ -0,0 +1,91 @@
+# Invoice backend benchmark: single-invoice throughput of each PDF backend on 1-, 10- and 100-line
+# invoices, then the time and peak Python memory of a merged render_many() export.
+#
+#   python bench/invoice_backends.py [invoices per size]
+#
+# wkhtmltopdf is taken from PATH, or from the WKHTMLTOPDF environment variable, and is skipped
+# when it is not installed. Its memory lives in the wkhtmltopdf process, so only reportlab's merged
+# peak is reported.
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import REPO_ROOT
+
+sys.path.insert(0, REPO_ROOT)
+from invoice import Invoice, InvoiceDetail, InvoiceLine, ReportLabBackend, WkhtmltopdfBackend  # noqa: E402
+
+LINE_COUNTS = (1, 10, 100)
+MERGED_SIZES = (100, 1000)
+
+def sample_invoice(line_count, number=1):
+    return Invoice(
+        title="Sale Invoice",
+        details=[
+            InvoiceDetail("Invoice No", number),
+            InvoiceDetail("Date", "2026-01-15 11:30"),
+            InvoiceDetail("Customer", "Bench Customer"),
+            InvoiceDetail("Mobile", "9000000000"),
+            InvoiceDetail("Address", "Thawe Road, Gopalganj", full_width=True),
+        ],
+        lines=[InvoiceLine(f"Printed Cotton Suit {i}", 1 + i % 3, 749.0, 749.0 * (1 + i % 3), 999.0)
+               for i in range(line_count)],
+    )
+
+def available_backends():
+    backends = [ReportLabBackend()]
+    wkhtmltopdf = os.environ.get("WKHTMLTOPDF") or shutil.which("wkhtmltopdf")
+    if wkhtmltopdf:
+        import pdfkit
+        backends.append(WkhtmltopdfBackend(pdfkit.configuration(wkhtmltopdf=wkhtmltopdf)))
+    else:
+        print("wkhtmltopdf: skipped, not installed (set WKHTMLTOPDF to its path)")
+    return backends
+
+def single_throughput(backend, line_count, count):
+    invoices = [sample_invoice(line_count, number) for number in range(count)]
+    backend.render(invoices[0])  # warm-up: imports and font loading
+    start = time.perf_counter()
+    for invoice in invoices:
+        backend.render(invoice)
+    return count / (time.perf_counter() - start)
+
+def merged_export(backend, count, trace_memory):
+    chunks = ([sample_invoice(10, number) for number in range(first, min(first + 200, count))]
+              for first in range(0, count, 200))
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        backend.render_many(chunks, path)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        return elapsed, peak, os.path.getsize(path)
+    finally:
+        tracemalloc.stop()
+        os.remove(path)
+
+def main(count):
+    backends = available_backends()
+    print(f"\nSingle invoices, {count} per size (invoices/s)")
+    print(f"{'backend':<12}" + "".join(f"{f'{lines} lines':>12}" for lines in LINE_COUNTS))
+    for backend in backends:
+        rates = [single_throughput(backend, lines, count) for lines in LINE_COUNTS]
+        print(f"{backend.name:<12}" + "".join(f"{rate:>12.1f}" for rate in rates))
+    print("\nMerged render_many(), 10-line invoices")
+    print(f"{'backend':<12}{'invoices':>10}{'seconds':>10}{'peak MB':>10}{'PDF MB':>10}")
+    for backend in backends:
+        for size in MERGED_SIZES:
+            # Timed without tracemalloc, which slows allocation-heavy code down
+            elapsed, _, pdf_size = merged_export(backend, size, trace_memory=False)
+            peak = merged_export(backend, size, trace_memory=True)[1] if isinstance(backend, ReportLabBackend) else None
+            print(f"{backend.name:<12}{size:>10}{elapsed:>10.2f}{peak / 1e6 if peak else float('nan'):>10.1f}{pdf_size / 1e6:>10.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if sys.argv[1:] else 50))
@@ -0,0 +1,60 @@
+# Login throughput benchmark: a burst of concurrent logins, one thread per browser session, each
+# going through the login form's steps (throttle check, user lookup, bcrypt verification on the
+# shared AUTH_WORKERS pool). Reports the cost of one verification and the burst's wall time.
+#
+#   INAYA_AUTH_WORKERS=2 INAYA_BCRYPT_ROUNDS=12 python bench/login_throughput.py [concurrent logins]
+import os
+import statistics
+import sys
+import threading
+import time
+
+from common import load_app
+
+PASSWORD = "bench-password"
+
+def main(logins):
+    app = load_app()
+    hashed = app.hash_password(PASSWORD)
+    emails = [f"bench{i}@example.com" for i in range(logins)]
+    app.session.add_all(app.User(name=f"Bench {i}", email=email, password=hashed, role="Salesman", is_active=True)
+                        for i, email in enumerate(emails))
+    app.session.commit()
+    app.session.remove()
+
+    start = time.perf_counter()
+    app.verify_password(PASSWORD, hashed)
+    single = time.perf_counter() - start
+
+    latencies, failures = [], []
+    def login(email):
+        started = time.perf_counter()
+        try:
+            if app.login_throttle(email):
+                failures.append(f"{email}: throttled")
+                return
+            user = app.session.query(app.User).filter_by(email=email, is_active=True).first()
+            if not (user and app.verify_password(PASSWORD, user.password)):
+                failures.append(f"{email}: rejected")
+        finally:
+            app.session.remove()
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login, args=(email,)) for email in emails]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    print(f"bcrypt cost {app.BCRYPT_ROUNDS}, {app.AUTH_WORKERS} auth workers, {os.cpu_count()} CPUs")
+    print(f"One verification: {single:.3f} s")
+    print(f"{logins} concurrent logins: {wall:.2f} s wall, {logins / wall:.1f} logins/s, "
+          f"latency median {statistics.median(latencies):.2f} s, max {max(latencies):.2f} s")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if sys.argv[1:] else 10))
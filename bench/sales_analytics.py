@@ -0,0 +1,77 @@
+# Sales Analytics benchmark: seeds a year of sales (300 items, 80-160 sales a day of 1-4 lines
+# each, about 4% of lines partly returned), rebuilds the daily summary tables from the Sale
+# Management page, then times the Sales Analytics page over the last 30 and 365 days.
+#
+#   python bench/sales_analytics.py [days of history]
+#
+# Exits with status 1 if the page takes longer than MAX_PAGE_SECONDS for the full range.
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from common import best_of, run_page, use_scratch_database
+
+STOCK_ITEMS = 300
+MAX_PAGE_SECONDS = 1.0
+
+def seed_stock(conn):
+    conn.executemany(
+        "INSERT INTO stock (name, sku, quantity, selling_price, mrp, reorder_level) VALUES (?, ?, 1000, ?, ?, 0)",
+        [(f"Bench Item {i}", f"BENCH-{i:05d}", 400.0 + 5 * i, 500.0 + 6 * i) for i in range(STOCK_ITEMS)],
+    )
+    return [(row[0], row[1]) for row in conn.execute("SELECT id, selling_price FROM stock")]
+
+# Sales are inserted with explicit ids so their lines and returns can reference them in bulk
+def seed_sales(conn, stock, days):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    sales, lines, returns = [], [], []
+    for day in range(days):
+        opening = today - timedelta(days=day) + timedelta(hours=10)
+        for _ in range(random.randint(80, 160)):
+            sale_id = len(sales) + 1
+            sold_at = opening + timedelta(minutes=random.randint(0, 10 * 60))
+            sales.append((sale_id, f"Customer {sale_id % 5000}", f"9{sale_id % 5000:09d}", "Gopalganj", sold_at))
+            for stock_id, price in random.sample(stock, random.randint(1, 4)):
+                quantity = random.randint(1, 3)
+                line_id = len(lines) + 1
+                lines.append((line_id, sale_id, stock_id, quantity, quantity * price * random.choice((1.0, 1.0, 0.9))))
+                if random.random() < 0.04:
+                    returns.append((line_id, random.randint(1, quantity), "Size issue", sold_at + timedelta(days=2)))
+    conn.executemany("INSERT INTO sale (id, customer_name, customer_mobile, customer_address, date) VALUES (?, ?, ?, ?, ?)", sales)
+    conn.executemany("INSERT INTO sale_item (id, sale_id, stock_id, quantity, total_price) VALUES (?, ?, ?, ?, ?)", lines)
+    conn.executemany('INSERT INTO "return" (sale_item_id, quantity, reason, date) VALUES (?, ?, ?, ?)', returns)
+    conn.commit()
+    return len(sales), len(lines), len(returns)
+
+# Best time of the page rerun that follows picking the range's start date
+def time_analytics_page(days, repeat=3):
+    at = run_page("Sales Analytics")
+    at.date_input(key="analytics_start").set_value(datetime.utcnow().date() - timedelta(days=days - 1))
+    elapsed, _ = best_of(repeat, at.run)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed, at.metric[0].value
+
+def main(days):
+    random.seed(1)
+    database_path = use_scratch_database()
+    run_page("Sales Analytics")  # creates the schema; also warms imports and caches
+    conn = sqlite3.connect(database_path)
+    sale_count, line_count, return_count = seed_sales(conn, seed_stock(conn), days)
+    print(f"Seeded {sale_count:,} sales, {line_count:,} sale lines and {return_count:,} returns over {days} days")
+
+    at = run_page("Sale Management")
+    next(button for button in at.button if button.label == "Rebuild Sales Summary").click()
+    at.run()
+    print("Rebuild:", [message.value for message in (*at.success, *at.warning, *at.error)])
+    item_days = conn.execute("SELECT count(*) FROM daily_item_sales").fetchone()[0]
+    print(f"Summary tables: {item_days:,} item-day rows")
+
+    for range_days in (30, days):
+        elapsed, revenue = time_analytics_page(range_days)
+        print(f"Sales Analytics page, last {range_days} days: {elapsed * 1000:.0f} ms (revenue {revenue})")
+    return 0 if elapsed <= MAX_PAGE_SECONDS else 1
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if sys.argv[1:] else 365))
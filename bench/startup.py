@@ -0,0 +1,42 @@
+# Startup benchmark: executes app.py in bare mode the way Streamlit runs it, on an already migrated
+# database, and reports the cold first run (login page, one-time setup included) and the median of
+# the warm reruns that follow in the same process.
+#
+#   python bench/startup.py [warm reruns]
+#
+# Also reports which heavy modules the first run loaded: pandas should only load with the pages that
+# use it, while pdfkit and reportlab load when the invoice backend is probed at startup.
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import time
+
+from common import APP_PATH, REPO_ROOT, use_scratch_database
+
+def main(reruns):
+    use_scratch_database()
+    # Migrate in a separate process so the cold run below only pays for a normal start
+    subprocess.run([sys.executable, APP_PATH, "migrate"], check=True, cwd=REPO_ROOT, env=os.environ,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    import streamlit  # noqa: F401  (already loaded by the Streamlit server before the first run)
+
+    start = time.perf_counter()
+    runpy.run_path(APP_PATH)
+    cold = time.perf_counter() - start
+    loaded = {name: name in sys.modules for name in ("pandas", "reportlab", "pdfkit")}
+
+    warm = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        runpy.run_path(APP_PATH)
+        warm.append(time.perf_counter() - start)
+
+    print(f"Cold start (login page): {cold:.3f} s")
+    print(f"Warm rerun: median {statistics.median(warm) * 1000:.1f} ms, best {min(warm) * 1000:.1f} ms over {reruns} runs")
+    print("Loaded by the login page: " + ", ".join(f"{name}={'yes' if found else 'no'}" for name, found in loaded.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if sys.argv[1:] else 10))
@@ -0,0 +1,345 @@
+"""Invoice rendering for Inaya Cloth.
+
+Sale, GRN, return and delivery invoices share one layout. Callers describe a document
+with an `Invoice` and get the HTML from `render_invoice_html()`, or a PDF from one of
+the backends at the bottom of this module. Nothing here depends on Streamlit or the
+database, and the PDF libraries are only imported by the backend that needs them.
+"""
+import io
+import os
+import tempfile
+from dataclasses import dataclass, field
+from html import escape
+from string import Template
+from typing import List, Optional
+
+SHOP_NAME = "Inaya Cloth"
+SHOP_TAGLINE = "Ladies Specialist"
+SHOP_ADDRESS = "Thawe Road, Near SBI Bank, Rasul Market – 841428"
+SHOP_MOBILE = "9936551234"
+
+
+@dataclass
+class InvoiceDetail:
+    label: str
+    value: object
+    full_width: bool = False
+
+
+@dataclass
+class InvoiceLine:
+    name: str
+    quantity: int
+    selling_price: float
+    total: float
+    mrp: Optional[float] = None
+
+
+@dataclass
+class Invoice:
+    title: str
+    details: List[InvoiceDetail]
+    lines: List[InvoiceLine]
+    show_mrp: bool = True
+    total_heading: str = "Total"
+    show_grand_total: bool = True
+    footer: str = f"Thank you for choosing {SHOP_NAME}!"
+    grand_total: float = field(init=False)
+
+    def __post_init__(self):
+        self.grand_total = sum(line.total for line in self.lines)
+
+
+# Templates are compiled once at import; every value substituted into them is escaped first.
+DOCUMENT_TEMPLATE = Template("""
+<div style="font-family: Arial, sans-serif; width: 800px; margin: 0 auto; padding: 20px; border: 2px solid #7E3F8F;">
+    <div style="text-align: center; margin-bottom: 20px;">
+        <h1 style="color: #7E3F8F;">$shop_name</h1>
+        <p style="font-size: 0.9em;">$shop_tagline</p>
+        <p style="font-size: 0.9em;">$shop_address</p>
+        <p style="font-size: 0.9em;">Mobile: $shop_mobile</p>
+    </div>
+    <hr style="border: 1px solid #7E3F8F;">
+    <h2 style="text-align: center;">$title</h2>
+    <table style="width: 100%; font-size: 0.9em;">$detail_rows
+    </table>
+    <table border="1" style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
+        <tr style="background-color: #f3e8ff;">$header_cells
+        </tr>$line_rows$grand_total_row
+    </table>
+    <div style="text-align: center; margin-top: 20px;">
+        <p style="font-size: 0.8em;">$footer</p>
+    </div>
+</div>
+""")
+DETAIL_PAIR_TEMPLATE = Template("""
+        <tr>
+            <td><strong>$left_label:</strong> $left_value</td>
+            <td style="text-align: right;"><strong>$right_label:</strong> $right_value</td>
+        </tr>""")
+DETAIL_SINGLE_TEMPLATE = Template("""
+        <tr>
+            <td><strong>$label:</strong> $value</td>
+        </tr>""")
+DETAIL_FULL_WIDTH_TEMPLATE = Template("""
+        <tr>
+            <td colspan="2"><strong>$label:</strong> $value</td>
+        </tr>""")
+HEADER_CELL_TEMPLATE = Template("""
+            <th style="padding: 10px;">$heading</th>""")
+LINE_ROW_TEMPLATE = Template("""
+        <tr>$cells
+        </tr>""")
+LINE_CELL_TEMPLATE = Template("""
+            <td style="padding: 10px;">$value</td>""")
+GRAND_TOTAL_TEMPLATE = Template("""
+        <tr style="background-color: #f3e8ff;">
+            <td colspan="$label_span" style="padding: 10px; text-align: right;"><strong>Grand Total:</strong></td>
+            <td style="padding: 10px;">$grand_total</td>
+        </tr>""")
+
+
+def format_money(amount):
+    return f"Rs. {amount:.2f}"
+
+
+# Details are laid out two to a row (left and right aligned); a full-width detail gets a row of its own
+def detail_rows(details):
+    rows = []
+    pending = None
+    for detail in details:
+        if detail.full_width:
+            if pending is not None:
+                rows.append([pending])
+                pending = None
+            rows.append([detail])
+        elif pending is None:
+            pending = detail
+        else:
+            rows.append([pending, detail])
+            pending = None
+    if pending is not None:
+        rows.append([pending])
+    return rows
+
+
+def table_headings(invoice):
+    return ["Item Name", "Quantity"] + (["MRP"] if invoice.show_mrp else []) + ["Selling Price", invoice.total_heading]
+
+
+def line_values(invoice, line):
+    values = [line.name, str(line.quantity)]
+    if invoice.show_mrp:
+        values.append(format_money(line.mrp if line.mrp is not None else line.selling_price))
+    return values + [format_money(line.selling_price), format_money(line.total)]
+
+
+def _detail_row_html(row):
+    if len(row) == 2:
+        left, right = row
+        return DETAIL_PAIR_TEMPLATE.substitute(
+            left_label=escape(left.label), left_value=escape(str(left.value)),
+            right_label=escape(right.label), right_value=escape(str(right.value)),
+        )
+    template = DETAIL_FULL_WIDTH_TEMPLATE if row[0].full_width else DETAIL_SINGLE_TEMPLATE
+    return template.substitute(label=escape(row[0].label), value=escape(str(row[0].value)))
+
+
+def render_invoice_html(invoice):
+    headings = table_headings(invoice)
+    grand_total_row = ""
+    if invoice.show_grand_total:
+        grand_total_row = GRAND_TOTAL_TEMPLATE.substitute(
+            label_span=len(headings) - 1,
+            grand_total=format_money(invoice.grand_total),
+        )
+    return DOCUMENT_TEMPLATE.substitute(
+        shop_name=escape(SHOP_NAME),
+        shop_tagline=escape(SHOP_TAGLINE),
+        shop_address=escape(SHOP_ADDRESS),
+        shop_mobile=escape(SHOP_MOBILE),
+        title=escape(invoice.title),
+        detail_rows="".join(_detail_row_html(row) for row in detail_rows(invoice.details)),
+        header_cells="".join(HEADER_CELL_TEMPLATE.substitute(heading=escape(heading)) for heading in headings),
+        line_rows="".join(
+            LINE_ROW_TEMPLATE.substitute(cells="".join(LINE_CELL_TEMPLATE.substitute(value=escape(value))
+                                                       for value in line_values(invoice, line)))
+            for line in invoice.lines
+        ),
+        grand_total_row=grand_total_row,
+        footer=escape(invoice.footer),
+    )
+
+
+# PDF backends. `render()` returns one invoice as PDF bytes; `render_many()` writes a stream of
+# invoice chunks (lists of invoices) into a single PDF file at `path`. The chunks keep the invoices
+# themselves out of memory, but the PDF is still assembled in one go (one wkhtmltopdf run, one
+# reportlab canvas), so its memory grows with the page count: callers must bound the number of
+# invoices. bench/invoice_backends.py measures both methods.
+class InvoiceBackend:
+    name = "base"
+
+    def render(self, invoice):
+        raise NotImplementedError
+
+    def render_many(self, invoice_chunks, path):
+        raise NotImplementedError
+
+
+class WkhtmltopdfBackend(InvoiceBackend):
+    name = "wkhtmltopdf"
+
+    def __init__(self, configuration):
+        self.configuration = configuration
+
+    def render(self, invoice):
+        import pdfkit
+        return pdfkit.from_string(render_invoice_html(invoice), False, configuration=self.configuration)
+
+    def render_many(self, invoice_chunks, path):
+        # One HTML file per chunk, then a single wkhtmltopdf run over all of them
+        import pdfkit
+        with tempfile.TemporaryDirectory(prefix="invoices_") as html_dir:
+            html_paths = []
+            for invoices in invoice_chunks:
+                html_path = os.path.join(html_dir, f"chunk_{len(html_paths):05d}.html")
+                with open(html_path, "w", encoding="utf-8") as chunk_file:
+                    chunk_file.write('<html><head><meta charset="utf-8"></head><body>')
+                    for invoice in invoices:
+                        chunk_file.write(f'<div style="page-break-after: always;">{render_invoice_html(invoice)}</div>')
+                    chunk_file.write("</body></html>")
+                html_paths.append(html_path)
+            if html_paths:
+                pdfkit.from_file(html_paths, path, configuration=self.configuration)
+
+
+class ReportLabBackend(InvoiceBackend):
+    """Draws the invoice layout directly with reportlab, without a browser engine or subprocess.
+
+    Uses the standard PDF fonts, so text outside the Windows-1252 character set is not rendered.
+    """
+    name = "reportlab"
+    MARGIN = 40
+    ROW_HEIGHT = 20
+    NUMBER_COLUMN_WIDTH = 85
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        from reportlab.pdfgen import canvas
+        self.canvas = canvas
+        self.page_width, self.page_height = A4
+        self.string_width = stringWidth
+        self.brand = colors.HexColor("#7E3F8F")
+        self.shade = colors.HexColor("#f3e8ff")
+        self.black = colors.black
+
+    def render(self, invoice):
+        buffer = io.BytesIO()
+        pdf = self.canvas.Canvas(buffer, pagesize=(self.page_width, self.page_height))
+        self._draw(pdf, invoice)
+        pdf.save()
+        return buffer.getvalue()
+
+    def render_many(self, invoice_chunks, path):
+        # The canvas keeps every finished page until save(): about 15 MB per 1,000 invoices
+        pdf = self.canvas.Canvas(path, pagesize=(self.page_width, self.page_height))
+        for invoices in invoice_chunks:
+            for invoice in invoices:
+                self._draw(pdf, invoice)
+        pdf.save()
+
+    def _fit(self, text, font, size, width):
+        if self.string_width(text, font, size) <= width:
+            return text
+        while text and self.string_width(text + "...", font, size) > width:
+            text = text[:-1]
+        return text + "..."
+
+    def _start_page(self, pdf):
+        pdf.setStrokeColor(self.brand)
+        pdf.setLineWidth(2)
+        pdf.rect(self.MARGIN - 10, self.MARGIN - 10, self.page_width - 2 * (self.MARGIN - 10), self.page_height - 2 * (self.MARGIN - 10))
+        pdf.setLineWidth(0.5)
+        return self.page_height - self.MARGIN - 20
+
+    def _draw_detail(self, pdf, detail, x, y, align_right=False):
+        label = f"{detail.label}: "
+        value = str(detail.value)
+        label_width = self.string_width(label, "Helvetica-Bold", 9)
+        if align_right:
+            x -= label_width + self.string_width(value, "Helvetica", 9)
+        pdf.setFont("Helvetica-Bold", 9)
+        pdf.drawString(x, y, label)
+        pdf.setFont("Helvetica", 9)
+        pdf.drawString(x + label_width, y, value)
+
+    def _draw_row(self, pdf, values, widths, y, bold=False, shaded=False):
+        left = self.MARGIN
+        if shaded:
+            pdf.setFillColor(self.shade)
+            pdf.rect(left, y, sum(widths), self.ROW_HEIGHT, stroke=0, fill=1)
+            pdf.setFillColor(self.black)
+        font = "Helvetica-Bold" if bold else "Helvetica"
+        pdf.setFont(font, 9)
+        x = left
+        for value, width in zip(values, widths):
+            pdf.rect(x, y, width, self.ROW_HEIGHT, stroke=1, fill=0)
+            pdf.drawString(x + 5, y + 6, self._fit(value, font, 9, width - 10))
+            x += width
+
+    def _draw(self, pdf, invoice):
+        width = self.page_width
+        center = width / 2
+        left, right = self.MARGIN, width - self.MARGIN
+        y = self._start_page(pdf)
+
+        pdf.setFillColor(self.brand)
+        pdf.setFont("Helvetica-Bold", 20)
+        pdf.drawCentredString(center, y, SHOP_NAME)
+        pdf.setFillColor(self.black)
+        pdf.setFont("Helvetica", 9)
+        for text in (SHOP_TAGLINE, SHOP_ADDRESS, f"Mobile: {SHOP_MOBILE}"):
+            y -= 14
+            pdf.drawCentredString(center, y, text)
+        y -= 12
+        pdf.setStrokeColor(self.brand)
+        pdf.line(left, y, right, y)
+        pdf.setStrokeColor(self.black)
+        y -= 24
+        pdf.setFont("Helvetica-Bold", 14)
+        pdf.drawCentredString(center, y, invoice.title)
+        y -= 22
+
+        for row in detail_rows(invoice.details):
+            self._draw_detail(pdf, row[0], left, y)
+            if len(row) == 2:
+                self._draw_detail(pdf, row[1], right, y, align_right=True)
+            y -= 14
+        y -= 8
+
+        headings = table_headings(invoice)
+        widths = [right - left - self.NUMBER_COLUMN_WIDTH * (len(headings) - 1)] + [self.NUMBER_COLUMN_WIDTH] * (len(headings) - 1)
+        y -= self.ROW_HEIGHT
+        self._draw_row(pdf, headings, widths, y, bold=True, shaded=True)
+        for line in invoice.lines:
+            if y - self.ROW_HEIGHT < self.MARGIN + 40:
+                pdf.showPage()
+                y = self._start_page(pdf) - self.ROW_HEIGHT
+                self._draw_row(pdf, headings, widths, y, bold=True, shaded=True)
+            y -= self.ROW_HEIGHT
+            self._draw_row(pdf, line_values(invoice, line), widths, y)
+        if invoice.show_grand_total:
+            if y - self.ROW_HEIGHT < self.MARGIN + 40:
+                pdf.showPage()
+                y = self._start_page(pdf)
+            y -= self.ROW_HEIGHT
+            self._draw_row(pdf, ["", format_money(invoice.grand_total)], [sum(widths[:-1]), widths[-1]], y, shaded=True)
+            pdf.setFont("Helvetica-Bold", 9)
+            pdf.drawRightString(left + sum(widths[:-1]) - 5, y + 6, "Grand Total:")
+
+        y -= 30
+        pdf.setFont("Helvetica", 8)
+        pdf.drawCentredString(center, max(y, self.MARGIN), invoice.footer)
+        pdf.showPage()